@@ -0,0 +1,207 @@
+"""
+Admission control as a pure ASGI middleware.
+
+Requests are sorted into route classes (auth, reads, writes, files, public)
+by method and path. Each class admits at most `concurrency` requests at a
+time and queues up to `queue` more in arrival order. When the queue is full,
+or a request has waited ADMISSION_QUEUE_TIMEOUT_SECONDS, the request is shed
+with 503 and a Retry-After derived from the class's recent queue times. A
+slow database then costs a bounded number of in-flight requests per class
+instead of an unbounded pile-up, and a flood of one kind (logins, downloads)
+can't starve the others.
+
+Server-sent event streams and the admission metrics endpoint are never
+queued: one holds its connection open for hours, the other must answer while
+everything else is shedding.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Admission Control Configuration: (concurrency, queue) per route class
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LIMITS = {
+    "auth": (int(os.environ.get("ADMISSION_AUTH_CONCURRENCY", "16")), int(os.environ.get("ADMISSION_AUTH_QUEUE", "64"))),
+    "reads": (int(os.environ.get("ADMISSION_READS_CONCURRENCY", "64")), int(os.environ.get("ADMISSION_READS_QUEUE", "256"))),
+    "writes": (int(os.environ.get("ADMISSION_WRITES_CONCURRENCY", "32")), int(os.environ.get("ADMISSION_WRITES_QUEUE", "128"))),
+    "files": (int(os.environ.get("ADMISSION_FILES_CONCURRENCY", "32")), int(os.environ.get("ADMISSION_FILES_QUEUE", "128"))),
+    "public": (int(os.environ.get("ADMISSION_PUBLIC_CONCURRENCY", "64")), int(os.environ.get("ADMISSION_PUBLIC_QUEUE", "256"))),
+}
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+ADMISSION_METRICS_PATH = "/api/admin/admission"
+
+RETRY_AFTER_MAX_SECONDS = 60
+EWMA_WEIGHT = 0.1  # Weight of the newest sample in the moving averages
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Route class of a request, or None when it is not subject to admission"""
+    if not path.startswith("/api/") or method == "OPTIONS":
+        return None
+    if path == ADMISSION_METRICS_PATH or path.endswith("/documents/events"):
+        return None
+    if path.startswith("/api/auth/"):
+        return "auth"
+    if path.startswith("/api/public/"):
+        return "public"
+    if method in ("GET", "HEAD"):
+        if path.startswith("/api/documents/") and path.endswith(("/view", "/thumbnail")):
+            return "files"
+        return "reads"
+    if method == "POST" and path == "/api/documents/batch":
+        return "reads"
+    return "writes"
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClassLimiter:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: deque = deque()
+        # Metrics
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.queue_ewma = 0.0  # Seconds waited before admission, including timeouts
+        self.queue_max = 0.0
+        self.service_ewma = 0.0  # Seconds holding a slot
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the time spent queued or raises Overloaded"""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            self._record_wait(0.0)
+            return 0.0
+        if len(self.waiters) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise Overloaded("queue_full", self.retry_after())
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            self.shed_timeout += 1
+            self._record_wait(self.timeout)
+            raise Overloaded("timeout", self.retry_after())
+        except BaseException:
+            # Client went away while queued; hand on a slot it was just given
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            raise
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self._record_wait(waited)
+        return waited
+
+    def release(self, service_time: float) -> None:
+        self.service_ewma += EWMA_WEIGHT * (service_time - self.service_ewma)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the next request in line
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        return max(1, min(RETRY_AFTER_MAX_SECONDS, math.ceil(self.queue_ewma)))
+
+    def _discard(self, waiter) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _record_wait(self, waited: float) -> None:
+        self.queue_ewma += EWMA_WEIGHT * (waited - self.queue_ewma)
+        self.queue_max = max(self.queue_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "queue_ms_avg": round(self.queue_ewma * 1000, 1),
+            "queue_ms_max": round(self.queue_max * 1000, 1),
+            "service_ms_avg": round(self.service_ewma * 1000, 1),
+            "retry_after": self.retry_after(),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, tuple] = ADMISSION_LIMITS, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.limiters = {name: RouteClassLimiter(name, *limit) for name, limit in limits.items()}
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        route = route_class(scope["method"], scope["path"]) if scope["type"] == "http" and self.controller.enabled else None
+        limiter = self.controller.limiters.get(route) if route else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            await self._shed(send, e)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _shed(send, overloaded: Overloaded) -> None:
+        body = json.dumps({"detail": "Server busy, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(overloaded.retry_after).encode()),
+                (b"x-shed-reason", overloaded.reason.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,119 @@
+"""
+Per-workspace document changes feed.
+
+Documents are ordered by (updated_at, id); deletions are recorded as
+tombstones ordered by (deleted_at, document_id) and expire after
+CHANGES_TOMBSTONE_DAYS. A sync token is an opaque cursor into that order.
+
+Timestamps are stamped before writes commit, so a final token points
+CHANGES_LOOKBACK seconds back from the time the sync started. Changes in that
+window may be delivered twice; clients apply them idempotently (upsert by id,
+delete by id).
+"""
+
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Changes Feed Configuration
+CHANGES_PAGE_SIZE = int(os.environ.get("CHANGES_PAGE_SIZE", "500"))
+CHANGES_TOMBSTONE_DAYS = int(os.environ.get("CHANGES_TOMBSTONE_DAYS", "30"))
+CHANGES_LOOKBACK = timedelta(seconds=float(os.environ.get("CHANGES_LOOKBACK_SECONDS", "5")))
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class SyncTokenExpired(Exception):
+    """Tombstones older than the token may be gone; the client must reload"""
+
+
+def encode_token(timestamp: str, last_id: str = "", floor: Optional[str] = None) -> str:
+    raw = json.dumps({"t": timestamp, "i": last_id, "f": floor}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if not isinstance(data, dict):
+            raise InvalidSyncToken(token)
+        if not isinstance(data.get("t"), str) or not isinstance(data.get("i"), str):
+            raise ValueError(token)
+        if data.get("f") is not None and not isinstance(data["f"], str):
+            raise ValueError(token)
+        return data
+    except ValueError:
+        raise InvalidSyncToken(token)
+
+
+async def ensure_change_indexes(db) -> None:
+    await db.documents.create_index([("workspace_id", 1), ("updated_at", 1), ("id", 1)])
+    await db.document_tombstones.create_index([("workspace_id", 1), ("deleted_at", 1), ("document_id", 1)])
+    await db.document_tombstones.create_index("expire_at", expireAfterSeconds=0)
+
+
+async def record_tombstone(db, document_id: str, workspace_id: str) -> None:
+    now = datetime.now(timezone.utc)
+    await db.document_tombstones.insert_one({
+        "document_id": document_id,
+        "workspace_id": workspace_id,
+        "deleted_at": now.isoformat(),
+        "expire_at": now + timedelta(days=CHANGES_TOMBSTONE_DAYS),
+    })
+
+
+def _after(time_field: str, id_field: str, timestamp: str, last_id: str) -> dict:
+    return {"$or": [
+        {time_field: {"$gt": timestamp}},
+        {time_field: timestamp, id_field: {"$gt": last_id}},
+    ]}
+
+
+async def fetch_changes(db, workspace_id: str, token: Optional[str] = None, limit: int = CHANGES_PAGE_SIZE) -> dict:
+    """One page of changes after token; without a token, every document (a snapshot).
+
+    Returns documents, deleted ids, the next token and whether more pages follow.
+    """
+    now = datetime.now(timezone.utc)
+    cursor = decode_token(token) if token else {"t": "", "i": "", "f": None}
+    # Where the sync started, minus the lookback; carried through every page
+    floor = cursor["f"] or (now - CHANGES_LOOKBACK).isoformat()
+
+    if token and min(cursor["t"], floor) < (now - timedelta(days=CHANGES_TOMBSTONE_DAYS)).isoformat():
+        raise SyncTokenExpired(token)
+
+    documents = await db.documents.find(
+        {"workspace_id": workspace_id, **_after("updated_at", "id", cursor["t"], cursor["i"])},
+        {"_id": 0}
+    ).sort([("updated_at", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+
+    tombstones = []
+    if token:
+        tombstones = await db.document_tombstones.find(
+            {"workspace_id": workspace_id, **_after("deleted_at", "document_id", cursor["t"], cursor["i"])},
+            {"_id": 0, "document_id": 1, "deleted_at": 1}
+        ).sort([("deleted_at", 1), ("document_id", 1)]).limit(limit + 1).to_list(limit + 1)
+
+    # Merge both streams in key order and cut one page
+    entries = [(doc["updated_at"], doc["id"], doc) for doc in documents]
+    entries += [(tomb["deleted_at"], tomb["document_id"], None) for tomb in tombstones]
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    page = entries[:limit]
+    has_more = len(entries) > limit
+
+    if has_more:
+        next_token = encode_token(page[-1][0], page[-1][1], floor)
+    else:
+        next_token = encode_token(floor)
+
+    return {
+        "documents": [doc for _, _, doc in page if doc is not None],
+        "deleted": [doc_id for _, doc_id, doc in page if doc is None],
+        "token": next_token,
+        "has_more": has_more,
+    }
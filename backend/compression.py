@@ -0,0 +1,189 @@
+"""
+Negotiated gzip/brotli response compression as a pure ASGI middleware.
+
+Bodies are compressed chunk by chunk as the app sends them, so streaming
+responses stay streaming; at most minimum_size bytes are held back while
+deciding whether a body is worth compressing.
+
+Small bodies, HEAD requests, already-encoded responses, proxy offloads and
+media types that are compressed already (PDF, images, archives) pass through.
+"""
+
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered without Brotli
+    brotli = None
+
+# Compression Configuration
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+
+INCOMPRESSIBLE_TYPES = (
+    "application/pdf", "application/zip", "application/gzip", "application/x-7z-compressed",
+    "application/vnd.openxmlformats-officedocument", "application/octet-stream",
+    "image/", "video/", "audio/", "font/woff",
+    "text/event-stream",  # Events must reach the client as soon as they are sent
+)
+COMPRESSIBLE_IMAGE_TYPES = ("image/svg+xml",)
+OFFLOAD_HEADERS = (b"x-accel-redirect", b"x-sendfile")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding from Accept-Encoding, honouring q=0 exclusions"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type.startswith(COMPRESSIBLE_IMAGE_TYPES):
+        return True
+    return not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        # Sync flush so each streamed chunk reaches the client right away
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(send, encoding, self))
+
+
+class _CompressingSend:
+    """Holds the response start until the body is known to reach the minimum size"""
+
+    def __init__(self, send, encoding: str, config: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.config = config
+        self.start = None
+        self.buffer = b""
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = {name.lower(): value for name, value in message.get("headers", [])}
+            status = message["status"]
+            if (status < 200 or status in (204, 206, 304)
+                    or b"content-encoding" in headers
+                    or any(h in headers for h in OFFLOAD_HEADERS)
+                    or not is_compressible(headers.get(b"content-type", b"").decode("latin-1"))):
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            self.buffer += body
+            if more_body and len(self.buffer) < self.config.minimum_size:
+                return
+            start, self.start = self.start, None
+            body, self.buffer = self.buffer, b""
+            if not more_body and len(body) < self.config.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            if self.encoding == "br":
+                self.compressor = _Brotli(self.config.brotli_quality)
+            else:
+                self.compressor = _Gzip(self.config.gzip_level)
+            body = self.compressor.compress(body, final=not more_body)
+            await self.send(self._compressed_start(start, None if more_body else len(body)))
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compressor.compress(body, final=not more_body),
+            "more_body": more_body,
+        })
+
+    def _compressed_start(self, start: dict, length: Optional[int]) -> dict:
+        headers = []
+        vary = None
+        for name, value in start.get("headers", []):
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary = value
+                continue
+            if lower == b"etag" and not value.startswith(b"W/"):
+                # The encoded body differs byte-wise, so a strong validator no longer applies
+                value = b"W/" + value
+            headers.append((name, value))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**start, "headers": headers}
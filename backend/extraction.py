@@ -0,0 +1,349 @@
+"""
+Content text extraction for uploaded files.
+
+Text from local .pdf, .docx and .txt files is extracted in a process pool and
+stored in the document_contents side collection: the text itself compressed and
+capped for snippets, plus a capped set of folded terms with a multikey index
+for search_documents.
+
+Backfill existing documents:
+    python extraction.py --backfill
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from xml.etree import ElementTree
+
+from bson import Binary
+
+from textutils import fold_text, tokenize
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # PDF text is skipped without pypdfium2
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+# Extraction Configuration
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", "2"))
+EXTRACTION_QUEUE_SIZE = int(os.environ.get("EXTRACTION_QUEUE_SIZE", "500"))
+EXTRACTION_MAX_CHARS = int(os.environ.get("EXTRACTION_MAX_CHARS", "200000"))  # Stored text cap per document
+EXTRACTION_MAX_TERMS = int(os.environ.get("EXTRACTION_MAX_TERMS", "5000"))  # Indexed terms cap per document
+EXTRACTION_EXTENSIONS = {'.pdf', '.docx', '.txt'}
+MIN_TERM_LENGTH = 2
+SNIPPET_RADIUS = 80
+
+DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def file_signature(path: Path) -> Optional[str]:
+    """Cheap change detector: size and modification time"""
+    try:
+        stat_result = path.stat()
+    except OSError:
+        return None
+    return f"{stat_result.st_size}:{stat_result.st_mtime_ns}"
+
+
+def _extract_pdf(path: Path, max_chars: int) -> str:
+    parts, total = [], 0
+    pdf = pdfium.PdfDocument(str(path))
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            parts.append(text)
+            total += len(text)
+            if total >= max_chars:
+                break
+    finally:
+        pdf.close()
+    return "\n".join(parts)
+
+
+def _extract_docx(path: Path, max_chars: int) -> str:
+    parts, total = [], 0
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as xml:
+            for _, element in ElementTree.iterparse(xml):
+                if element.tag == f"{DOCX_NS}t" and element.text:
+                    parts.append(element.text)
+                    total += len(element.text)
+                elif element.tag == f"{DOCX_NS}p":
+                    parts.append("\n")
+                    element.clear()
+                if total >= max_chars:
+                    break
+    return "".join(parts)
+
+
+def _extract_txt(path: Path, max_chars: int) -> str:
+    limit = max_chars * 4
+    with open(path, "rb") as f:
+        raw = f.read(limit)
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if len(raw) == limit and e.reason == "unexpected end of data":
+            # The read stopped inside a multibyte character
+            return raw[:e.start].decode("utf-8", errors="ignore")
+        return raw.decode("latin-1")
+
+
+EXTRACTORS = {".pdf": _extract_pdf, ".docx": _extract_docx, ".txt": _extract_txt}
+
+
+def extract_content(file_path: str, max_chars: int = EXTRACTION_MAX_CHARS, max_terms: int = EXTRACTION_MAX_TERMS) -> dict:
+    """Extract, cap, compress and tokenize one file. Runs inside the process pool."""
+    path = Path(file_path)
+    signature = file_signature(path)
+    text = EXTRACTORS[path.suffix.lower()](path, max_chars)
+    text = re.sub(r"[ \t\r\f\v]+", " ", text).strip()
+    truncated = len(text) > max_chars
+    text = text[:max_chars]
+
+    # Unique terms in order of first appearance, so the cap keeps the start of the document
+    terms = list(dict.fromkeys(tokenize(text, MIN_TERM_LENGTH)))[:max_terms]
+
+    return {
+        "signature": signature,
+        "text_z": zlib.compress(text.encode("utf-8"), 6),
+        "length": len(text),
+        "truncated": truncated,
+        "terms": terms,
+    }
+
+
+def decompress_text(content: dict) -> str:
+    return zlib.decompress(content["text_z"]).decode("utf-8")
+
+
+def build_snippet(text: str, query_tokens: list, radius: int = SNIPPET_RADIUS) -> Optional[dict]:
+    """Snippet around the first matching token, with [start, end) highlight offsets
+    relative to the snippet"""
+    folded = fold_text(text)
+    first = None
+    for token in query_tokens:
+        match = re.search(r"\b" + re.escape(token), folded)
+        if match and (first is None or match.start() < first):
+            first = match.start()
+    if first is None:
+        return None
+
+    start = max(0, first - radius)
+    end = min(len(text), first + radius)
+    snippet = text[start:end]
+    folded_snippet = folded[start:end]
+
+    highlights = []
+    for token in query_tokens:
+        for match in re.finditer(r"\b" + re.escape(token) + r"\w*", folded_snippet):
+            highlights.append([match.start(), match.end()])
+    highlights.sort()
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    offset = len(prefix)
+    return {
+        "snippet": f"{prefix}{snippet}{suffix}",
+        "highlights": [[s + offset, e + offset] for s, e in highlights],
+    }
+
+
+def content_query(query_tokens: list) -> dict:
+    """Match every token as a term; the last one as a prefix so partial words match"""
+    clauses = [{"terms": token} for token in query_tokens[:-1]]
+    clauses.append({"terms": {"$regex": "^" + re.escape(query_tokens[-1])}})
+    return {"$and": clauses}
+
+
+class ContentIndexer:
+    """Bounded queue of documents to extract, drained by consumers that run the
+    extraction in a process pool and write document_contents"""
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS, queue_size: int = EXTRACTION_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._consumers = []
+        self.db = None
+        self.on_stored: Optional[Callable[[str], None]] = None  # Called with the workspace id of stored content
+
+    @staticmethod
+    def can_extract(file_path: str) -> bool:
+        if file_path.startswith(('http://', 'https://')):
+            return False
+        suffix = Path(file_path).suffix.lower()
+        if suffix == ".pdf" and pdfium is None:
+            return False
+        return suffix in EXTRACTION_EXTENSIONS
+
+    def start(self, db, on_stored: Optional[Callable[[str], None]] = None) -> None:
+        self.db = db
+        self.on_stored = on_stored
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = False) -> None:
+        if self._queue is None:
+            return
+        if drain:
+            await self._queue.join()
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue = None
+
+    def submit(self, doc: dict) -> bool:
+        """Queue from a request handler without waiting. When the queue is full
+        the document is dropped and left for the next backfill."""
+        if self._queue is None or not self.can_extract(doc["file_path"]):
+            return False
+        try:
+            self._queue.put_nowait(self._snapshot(doc))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Extraction queue full, deferring document {doc['id']} to backfill")
+            return False
+
+    async def put(self, doc: dict) -> None:
+        """Queue and wait for room (backfill applies backpressure this way)"""
+        if self.can_extract(doc["file_path"]):
+            await self._queue.put(self._snapshot(doc))
+
+    @staticmethod
+    def _snapshot(doc: dict) -> dict:
+        """Copy of the fields extraction needs; handlers go on to change their dict
+        (created_at becomes a datetime) while the document waits in the queue"""
+        created_at = doc["created_at"]
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        return {
+            "id": doc["id"],
+            "workspace_id": doc["workspace_id"],
+            "file_path": doc["file_path"],
+            "created_at": created_at,
+        }
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            doc = await self._queue.get()
+            try:
+                content = await loop.run_in_executor(self._executor, extract_content, doc["file_path"])
+                await self.db.document_contents.update_one(
+                    {"document_id": doc["id"]},
+                    {"$set": {
+                        "document_id": doc["id"],
+                        "workspace_id": doc["workspace_id"],
+                        "created_at": doc["created_at"],  # Search pages content matches with file name matches
+                        "file_path": doc["file_path"],
+                        "signature": content["signature"],
+                        "text_z": Binary(content["text_z"]),
+                        "length": content["length"],
+                        "truncated": content["truncated"],
+                        "terms": content["terms"],
+                        "extracted_at": datetime.now(timezone.utc).isoformat(),
+                    }},
+                    upsert=True
+                )
+                if self.on_stored is not None:
+                    self.on_stored(doc["workspace_id"])
+            except Exception as e:
+                logger.warning(f"Text extraction failed for document {doc['id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+content_indexer = ContentIndexer()
+
+
+async def ensure_content_indexes(db) -> None:
+    await db.document_contents.create_index("document_id", unique=True)
+    await db.document_contents.create_index([("workspace_id", 1), ("terms", 1), ("created_at", -1), ("document_id", -1)])
+
+
+async def backfill(db, indexer: ContentIndexer, force: bool = False, batch_size: int = 1000) -> int:
+    """Queue every local document whose content is missing or out of date"""
+    queued = 0
+
+    async def queue_batch(batch: list) -> int:
+        stored = {}
+        if not force:
+            cursor = db.document_contents.find(
+                {"document_id": {"$in": [doc["id"] for doc in batch]}},
+                {"_id": 0, "document_id": 1, "file_path": 1, "signature": 1, "created_at": 1}
+            )
+            async for content in cursor:
+                stored[content["document_id"]] = content
+        count = 0
+        for doc in batch:
+            content = stored.get(doc["id"]) or {}
+            signature = (doc["file_path"], file_signature(Path(doc["file_path"])))
+            if (content.get("file_path"), content.get("signature")) == signature:
+                if "created_at" not in content:
+                    # Extracted before contents carried created_at
+                    await db.document_contents.update_one({"document_id": doc["id"]}, {"$set": {"created_at": doc["created_at"]}})
+                continue
+            await indexer.put(doc)
+            count += 1
+        return count
+
+    batch = []
+    cursor = db.documents.find({}, {"_id": 0, "id": 1, "workspace_id": 1, "file_path": 1, "created_at": 1}).batch_size(batch_size)
+    async for doc in cursor:
+        if not indexer.can_extract(doc["file_path"]):
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            queued += await queue_batch(batch)
+            batch = []
+            logger.info("Queued %d documents for extraction", queued)
+    if batch:
+        queued += await queue_batch(batch)
+    return queued
+
+
+async def run_backfill(force: bool) -> None:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    await ensure_content_indexes(db)
+
+    indexer = ContentIndexer()
+    indexer.start(db)
+    queued = await backfill(db, indexer, force)
+    await indexer.stop(drain=True)
+    logger.info("Backfill finished: %d documents extracted", queued)
+    client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Extract and index document text")
+    parser.add_argument("--backfill", action="store_true", help="Process documents without up-to-date content")
+    parser.add_argument("--force", action="store_true", help="Re-extract every document")
+    args = parser.parse_args()
+    if args.backfill or args.force:
+        asyncio.run(run_backfill(args.force))
+    else:
+        parser.print_help()
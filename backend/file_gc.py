@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from bloom import BloomFilter
+from security import UPLOAD_DIR, UPLOAD_BASE_PATHS
+from storage import S3Storage, UPLOAD_QUARANTINE_DAYS, purge_quarantine_dir, quarantine_file, storage
+from thumbnails import THUMBNAIL_DIR_NAME
+
+logger = logging.getLogger(__name__)
+
+# Garbage Collection Configuration
+GC_BATCH_SIZE = int(os.environ.get("GC_BATCH_SIZE", "500"))
+GC_MIN_AGE_SECONDS = int(os.environ.get("GC_MIN_AGE_SECONDS", "3600"))  # Never touch recently written files
+GC_PAUSE_SECONDS = float(os.environ.get("GC_PAUSE_SECONDS", "0.05"))
+
+
+def upload_aliases(file_path: str) -> List[str]:
+    """The same upload can be referenced under any accepted base path"""
+    normalized = os.path.normpath(file_path)
+    aliases = [normalized]
+    for base in UPLOAD_BASE_PATHS:
+        if normalized.startswith(base + os.sep):
+            aliases.append(str(UPLOAD_DIR) + normalized[len(base):])
+    return aliases
+
+
+async def _is_referenced(db, field: str, value: str) -> bool:
+    """Indexed check made right before a file is removed, so a document created
+    or updated since the batch check keeps its file"""
+    values = upload_aliases(value) if field == "file_path" else [value]
+    return await db.documents.find_one({field: {"$in": values}}, {"_id": 1}) is not None
+
+
+async def remove_unreferenced_files(db, file_paths: List[str]) -> int:
+    """Remove the stored uploads among file_paths that no document references any
+    more. Local files go to UPLOAD_QUARANTINE_DIR."""
+    local = {p for p in file_paths if p and not p.startswith(('http://', 'https://'))}
+    if not local:
+        return 0
+    candidates = {alias for p in local for alias in upload_aliases(p)}
+    referenced = set(await db.documents.distinct("file_path", {"file_path": {"$in": list(candidates)}}))
+    referenced_aliases = {alias for p in referenced for alias in upload_aliases(p)}
+
+    removed = 0
+    for file_path in local:
+        if referenced_aliases.intersection(upload_aliases(file_path)):
+            continue
+        if await _is_referenced(db, "file_path", file_path):
+            continue
+        if await storage.delete(file_path):
+            removed += 1
+    return removed
+
+
+async def purge_quarantine(dry_run: bool = False, retention_days: float = UPLOAD_QUARANTINE_DAYS) -> int:
+    """Delete quarantined files (and objects, with the S3 backend) past their retention"""
+    cutoff = time.time() - retention_days * 86400
+    purged = await asyncio.to_thread(purge_quarantine_dir, cutoff, dry_run)
+    if isinstance(storage, S3Storage):
+        purged += await storage.purge_quarantine(cutoff, dry_run)
+    return purged
+
+
+def walk_files(root: Path, skip_dirs=()) -> Iterator[os.DirEntry]:
+    """Stream regular files below root without building the full listing"""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip_dirs:
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory: {e}")
+
+
+async def _build_filter(db, field: str, expand=None) -> BloomFilter:
+    """Bloom filter of every value of a document field. A filter miss proves the
+    value is unreferenced; hits (including false positives) are kept."""
+    total = await db.documents.estimated_document_count()
+    referenced = BloomFilter(max(total * 2, 1024), error_rate=0.001)
+    cursor = db.documents.find({field: {"$exists": True}}, {"_id": 0, field: 1}).batch_size(10000)
+    async for doc in cursor:
+        value = doc.get(field)
+        if not value:
+            continue
+        for key in (expand(value) if expand else [value]):
+            referenced.add(key)
+    return referenced
+
+
+async def _reclaim_batch(db, field: str, batch: List[tuple], dry_run: bool, upload_dir: Path) -> int:
+    """Re-check candidates against Mongo (documents may have been created after the
+    filter was built) and quarantine the ones still unreferenced"""
+    values = [value for _, value in batch]
+    if field == "file_path":
+        values = [alias for value in values for alias in upload_aliases(value)]
+    still_used = set(await db.documents.distinct(field, {field: {"$in": values}}))
+    if field == "file_path":
+        still_used = {alias for p in still_used for alias in upload_aliases(p)}
+
+    removed = 0
+    for path, value in batch:
+        if value in still_used:
+            continue
+        if dry_run:
+            logger.info(f"[dry-run] would quarantine {path}")
+            removed += 1
+        elif not await _is_referenced(db, field, value) and quarantine_file(path, upload_dir):
+            removed += 1
+    return removed
+
+
+async def collect_orphaned_files(db, ctx=None, dry_run: bool = True, upload_dir: Optional[Path] = None) -> dict:
+    """Move files in the local upload directory (uploads and thumbnails) that no
+    document references to UPLOAD_QUARANTINE_DIR, then purge quarantined files
+    and objects older than UPLOAD_QUARANTINE_DAYS. Only counts them unless
+    dry_run is False.
+
+    Referenced values are held in Bloom filters rather than Python sets, so memory
+    stays at a few bits per document. The upload directory is streamed and
+    candidates are reclaimed in batches of GC_BATCH_SIZE.
+    """
+    upload_dir = upload_dir or UPLOAD_DIR
+    cutoff = time.time() - GC_MIN_AGE_SECONDS
+    stats = {"scanned": 0, "files_removed": 0, "thumbnails_removed": 0, "quarantine_purged": 0, "dry_run": dry_run}
+
+    file_filter = await _build_filter(db, "file_path", upload_aliases)
+    thumb_filter = await _build_filter(db, "thumbnail_key")
+
+    file_batch, thumb_batch = [], []
+
+    async def flush(force: bool = False) -> None:
+        nonlocal file_batch, thumb_batch
+        if file_batch and (force or len(file_batch) >= GC_BATCH_SIZE):
+            stats["files_removed"] += await _reclaim_batch(db, "file_path", file_batch, dry_run, upload_dir)
+            file_batch = []
+            await asyncio.sleep(GC_PAUSE_SECONDS)
+        if thumb_batch and (force or len(thumb_batch) >= GC_BATCH_SIZE):
+            stats["thumbnails_removed"] += await _reclaim_batch(db, "thumbnail_key", thumb_batch, dry_run, upload_dir)
+            thumb_batch = []
+            await asyncio.sleep(GC_PAUSE_SECONDS)
+
+    for entry in walk_files(upload_dir):
+        stats["scanned"] += 1
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+        except OSError:
+            continue
+
+        path = Path(entry.path)
+        if path.parent.name == THUMBNAIL_DIR_NAME:
+            if entry.name not in thumb_filter:
+                thumb_batch.append((path, entry.name))
+        elif entry.path not in file_filter:
+            file_batch.append((path, entry.path))
+
+        await flush()
+        if ctx is not None and stats["scanned"] % 10000 == 0:
+            await ctx.progress(stats["scanned"], message="Scanning uploads")
+
+    await flush(force=True)
+    stats["quarantine_purged"] = await purge_quarantine(dry_run)
+    if ctx is not None:
+        await ctx.progress(stats["scanned"], stats["scanned"], "Done")
+    logger.info(f"Orphaned file collection finished: {stats}")
+    return stats
@@ -0,0 +1,94 @@
+"""
+Trigram similarity for typo-tolerant search.
+
+Words are compared the way PostgreSQL's pg_trgm does: each word is padded
+("  word ") and split into trigrams, and similarity is the size of the shared
+trigram set over the size of the union. "ecocardiogama" and "ecocardiograma"
+score 0.71; FUZZY_THRESHOLD (0.3, pg_trgm's default) is the cut-off.
+
+TrigramVocabulary indexes the distinct words of a corpus, not its documents:
+a query word only visits the words that share a trigram with it, so lookups
+grow with the vocabulary, which grows far slower than the number of documents.
+"""
+
+import heapq
+import os
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+# Fuzzy Search Configuration
+FUZZY_THRESHOLD = float(os.environ.get("FUZZY_THRESHOLD", "0.3"))
+FUZZY_MAX_TERMS = int(os.environ.get("FUZZY_MAX_TERMS", "20"))  # Similar words kept per query word
+FUZZY_MAX_INDEX_LOADS = int(os.environ.get("FUZZY_MAX_INDEX_LOADS", "20"))  # Workspace indexes built per request
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TrigramVocabulary:
+    """Inverted index from trigram to the ids of the words containing it"""
+
+    __slots__ = ("words", "sizes", "ids", "grams", "free")
+
+    def __init__(self):
+        self.words: List[Optional[str]] = []  # word id -> word, None once removed
+        self.sizes = array("H")  # word id -> number of distinct trigrams
+        self.ids: Dict[str, int] = {}
+        self.grams: Dict[str, array] = {}  # trigram -> word ids
+        self.free: List[int] = []  # Ids of removed words, reused first
+
+    def add(self, word: str) -> None:
+        if word in self.ids:
+            return
+        grams = trigrams(word)
+        if self.free:
+            word_id = self.free.pop()
+            self.words[word_id] = word
+            self.sizes[word_id] = min(len(grams), 0xFFFF)
+        else:
+            word_id = len(self.words)
+            self.words.append(word)
+            self.sizes.append(min(len(grams), 0xFFFF))
+        self.ids[word] = word_id
+        for gram in grams:
+            posting = self.grams.get(gram)
+            if posting is None:
+                posting = self.grams[gram] = array("I")
+            posting.append(word_id)
+
+    def remove(self, word: str) -> None:
+        word_id = self.ids.pop(word, None)
+        if word_id is None:
+            return
+        for gram in trigrams(word):
+            posting = self.grams.get(gram)
+            if posting is None:
+                continue
+            posting.remove(word_id)
+            if not posting:
+                del self.grams[gram]
+        self.words[word_id] = None
+        self.free.append(word_id)
+
+    def similar(self, word: str, threshold: float = FUZZY_THRESHOLD, limit: int = FUZZY_MAX_TERMS) -> List[Tuple[str, float]]:
+        """Most similar known words at or above threshold, best first"""
+        query = trigrams(word)
+        shared: Dict[int, int] = {}
+        for gram in query:
+            for word_id in self.grams.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+        scored = []
+        for word_id, count in shared.items():
+            score = count / (len(query) + self.sizes[word_id] - count)
+            if score >= threshold:
+                scored.append((score, self.words[word_id]))
+        return [(match, score) for score, match in heapq.nlargest(limit, scored)]
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from file_gc import collect_orphaned_files, remove_unreferenced_files
+from ids import new_id
+from membership import check_membership
+
+logger = logging.getLogger(__name__)
+
+# Job Queue Configuration
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", "7"))
+# Run a worker inside the API process; disable when dedicated worker.py processes run
+JOB_INLINE_WORKER = os.environ.get("JOB_INLINE_WORKER", "true").lower() == "true"
+
+# Cascade deletes run in chunks with a pause between them to leave room for live traffic
+CASCADE_CHUNK_SIZE = int(os.environ.get("CASCADE_CHUNK_SIZE", "1000"))
+CASCADE_PAUSE_SECONDS = float(os.environ.get("CASCADE_PAUSE_SECONDS", "0.1"))
+
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+
+def job_handler(job_type: str):
+    """Register an async handler(db, ctx, params) -> Optional[dict] for a job type"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+class JobLeaseLost(Exception):
+    """Another worker took over the job after our lease expired"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def ensure_job_indexes(db) -> None:
+    await db.jobs.create_index("id", unique=True)
+    await db.jobs.create_index([("status", 1), ("run_after", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    await db.jobs.create_index("expire_at", expireAfterSeconds=0)
+
+
+async def enqueue_job(db, job_type: str, params: dict, created_by: str, max_attempts: int = JOB_MAX_ATTEMPTS) -> dict:
+    now = _now().isoformat()
+    job = {
+        "id": new_id(),
+        "type": job_type,
+        "params": params,
+        "status": "queued",
+        "progress": {"done": 0, "total": None, "message": None},
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "result": None,
+        "error": None,
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now,
+        "run_after": now,
+        "lease_expires_at": None,
+        "worker_id": None,
+    }
+    await db.jobs.insert_one(job)
+    job.pop("_id", None)
+    return job
+
+
+async def claim_job(db, worker_id: str, job_types: List[str]) -> Optional[dict]:
+    """Atomically take the oldest runnable job: queued and due, or running with an expired lease"""
+    now = _now()
+    return await db.jobs.find_one_and_update(
+        {
+            "type": {"$in": job_types},
+            "$or": [
+                {"status": "queued", "run_after": {"$lte": now.isoformat()}},
+                {"status": "running", "lease_expires_at": {"$lt": now.isoformat()}},
+            ],
+            "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_expires_at": (now + timedelta(seconds=JOB_LEASE_SECONDS)).isoformat(),
+                "started_at": now.isoformat(),
+                "updated_at": now.isoformat(),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def fail_abandoned_jobs(db) -> int:
+    """Jobs whose lease expired on their last attempt can't be claimed again"""
+    now = _now()
+    result = await db.jobs.update_many(
+        {
+            "status": "running",
+            "lease_expires_at": {"$lt": now.isoformat()},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+        },
+        {"$set": {
+            "status": "failed",
+            "error": "Worker lease expired",
+            "finished_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "expire_at": now + timedelta(days=JOB_RETENTION_DAYS),
+        }}
+    )
+    return result.modified_count
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting"""
+
+    def __init__(self, db, job: dict, worker_id: str):
+        self.db = db
+        self.job = job
+        self.worker_id = worker_id
+
+    async def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        result = await self.db.jobs.update_one(
+            {"id": self.job["id"], "worker_id": self.worker_id, "status": "running"},
+            {"$set": {
+                "progress": {"done": done, "total": total, "message": message},
+                "updated_at": _now().isoformat(),
+            }}
+        )
+        if result.matched_count == 0:
+            raise JobLeaseLost(self.job["id"])
+
+
+class JobWorker:
+    """Claims and runs jobs with up to `concurrency` in flight, renewing leases while they run"""
+
+    def __init__(self, db, concurrency: int = 1, job_types: Optional[List[str]] = None, worker_id: Optional[str] = None):
+        self.db = db
+        self.concurrency = concurrency
+        self.job_types = job_types
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop claiming, cancel running jobs and hand them back to the queue"""
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+
+    async def run(self) -> None:
+        logger.info(f"Job worker {self.worker_id} started")
+        running = set()
+        last_reap = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            try:
+                if loop.time() - last_reap > JOB_LEASE_SECONDS:
+                    await fail_abandoned_jobs(self.db)
+                    last_reap = loop.time()
+
+                job = None
+                if len(running) < self.concurrency:
+                    job = await claim_job(self.db, self.worker_id, self.job_types or list(JOB_HANDLERS))
+                if job:
+                    task = asyncio.create_task(self._execute(job))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        if running:
+            # Don't hold up shutdown for long jobs: another worker resumes them
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+    async def _heartbeat(self, job: dict, handler_task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            result = await self.db.jobs.update_one(
+                {"id": job["id"], "worker_id": self.worker_id, "status": "running"},
+                {"$set": {"lease_expires_at": (_now() + timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()}}
+            )
+            if result.matched_count == 0:
+                handler_task.cancel()
+                return
+
+    async def _execute(self, job: dict) -> None:
+        owner = {"id": job["id"], "worker_id": self.worker_id, "status": "running"}
+        handler = JOB_HANDLERS.get(job["type"])
+        if handler is None:
+            logger.error(f"Job {job['id']} has unknown type {job['type']}")
+            now = _now()
+            await self.db.jobs.update_one(owner, {"$set": {
+                "status": "failed",
+                "error": f"Unknown job type: {job['type']}",
+                "worker_id": None,
+                "finished_at": now.isoformat(),
+                "updated_at": now.isoformat(),
+                "expire_at": now + timedelta(days=JOB_RETENTION_DAYS),
+            }})
+            return
+
+        ctx = JobContext(self.db, job, self.worker_id)
+        heartbeat = None
+        try:
+            handler_task = asyncio.create_task(handler(self.db, ctx, job.get("params") or {}))
+            heartbeat = asyncio.create_task(self._heartbeat(job, handler_task))
+            result = await handler_task
+        except asyncio.CancelledError:
+            if self._stopping.is_set():
+                await self._release(job, owner)
+            else:
+                logger.warning(f"Job {job['id']} lost its lease")
+            return
+        except JobLeaseLost:
+            logger.warning(f"Job {job['id']} lost its lease")
+            return
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed: {e}")
+            now = _now()
+            if job["attempts"] < job["max_attempts"]:
+                retry_at = now + timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1))
+                update = {"status": "queued", "run_after": retry_at.isoformat(), "lease_expires_at": None}
+            else:
+                update = {"status": "failed", "finished_at": now.isoformat(),
+                          "expire_at": now + timedelta(days=JOB_RETENTION_DAYS)}
+            update.update({"error": str(e), "worker_id": None, "updated_at": now.isoformat()})
+            await self.db.jobs.update_one(owner, {"$set": update})
+            return
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+        now = _now()
+        await self.db.jobs.update_one(owner, {"$set": {
+            "status": "succeeded",
+            "result": result,
+            "error": None,
+            "finished_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "expire_at": now + timedelta(days=JOB_RETENTION_DAYS),
+        }})
+
+
+    async def _release(self, job: dict, owner: dict) -> None:
+        """Requeue a job cancelled by shutdown; the interrupted attempt doesn't count"""
+        now = _now()
+        await self.db.jobs.update_one(owner, {
+            "$set": {"status": "queued", "run_after": now.isoformat(), "worker_id": None,
+                     "lease_expires_at": None, "updated_at": now.isoformat()},
+            "$inc": {"attempts": -1},
+        })
+        logger.info(f"Job {job['id']} released for another worker")
+
+
+# Job handlers
+
+@job_handler("delete_workspace")
+async def delete_workspace_job(db, ctx: JobContext, params: dict) -> dict:
+    """Remove the documents of a workspace that was already deleted, chunk by chunk.
+    Safe to retry: each chunk only sees documents that are still there."""
+    workspace_id = params["workspace_id"]
+    total = await db.documents.count_documents({"workspace_id": workspace_id})
+    deleted = files_removed = 0
+    await ctx.progress(0, total, "Deleting documents")
+
+    while True:
+        chunk = await db.documents.find(
+            {"workspace_id": workspace_id},
+            {"_id": 0, "id": 1, "file_path": 1}
+        ).limit(CASCADE_CHUNK_SIZE).to_list(CASCADE_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        doc_ids = [doc["id"] for doc in chunk]
+        result = await db.documents.delete_many({"id": {"$in": doc_ids}})
+        await db.document_contents.delete_many({"document_id": {"$in": doc_ids}})
+        files_removed += await remove_unreferenced_files(db, [doc["file_path"] for doc in chunk])
+
+        deleted += result.deleted_count
+        await ctx.progress(deleted, max(total, deleted), "Deleting documents")
+        await asyncio.sleep(CASCADE_PAUSE_SECONDS)
+
+    await ctx.progress(deleted, deleted, "Done")
+    return {"documents_deleted": deleted, "files_removed": files_removed}
+
+
+@job_handler("collect_orphaned_files")
+async def collect_orphaned_files_job(db, ctx: JobContext, params: dict) -> dict:
+    return await collect_orphaned_files(db, ctx, dry_run=params.get("dry_run", True))
+
+
+@job_handler("check_membership")
+async def check_membership_job(db, ctx: JobContext, params: dict) -> dict:
+    return await check_membership(db, ctx, repair=params.get("repair", False))
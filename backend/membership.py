@@ -0,0 +1,159 @@
+"""
+Team membership maintenance.
+
+Membership is stored on both sides: teams.user_ids and users.team_ids.
+teams.user_ids is authoritative; users.team_ids is kept in sync with it.
+Every write touches only the affected rows through indexed queries and, on a
+replica set, all of them commit in one multi-document transaction. Standalone
+servers have no transactions, so the writes run in order (authoritative side
+first) and check_membership repairs any drift left by an interrupted request.
+"""
+
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_REPAIR_BATCH_SIZE = int(os.environ.get("MEMBERSHIP_REPAIR_BATCH_SIZE", "500"))
+
+_transaction_support: Dict[int, bool] = {}
+
+
+async def ensure_membership_indexes(db) -> None:
+    await db.users.create_index("id", unique=True)
+    await db.users.create_index("team_ids")
+    await db.teams.create_index("id", unique=True)
+    await db.teams.create_index("user_ids")
+    await db.workspaces.create_index("team_ids")
+
+
+async def supports_transactions(client) -> bool:
+    """Transactions need a replica set member or a mongos"""
+    key = id(client)
+    if key not in _transaction_support:
+        try:
+            hello = await client.admin.command("hello")
+            _transaction_support[key] = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            logger.warning(f"Could not detect transaction support, writing without transactions: {e}")
+            _transaction_support[key] = False
+    return _transaction_support[key]
+
+
+async def run_in_transaction(client, callback: Callable[[Optional[object]], Awaitable]):
+    """Run callback(session) in one transaction, retried on transient errors.
+    Without transaction support the callback runs with session=None."""
+    if not await supports_transactions(client):
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+async def add_user_to_teams(db, user_id: str, team_ids: Iterable[str], session=None) -> None:
+    team_ids = list(team_ids)
+    if team_ids:
+        await db.teams.update_many({"id": {"$in": team_ids}}, {"$addToSet": {"user_ids": user_id}}, session=session)
+
+
+async def set_team_members(db, team_id: str, old_user_ids: Iterable[str], new_user_ids: Iterable[str], session=None) -> None:
+    """Point users.team_ids at the new member list; only users that joined or left are written"""
+    old_user_ids, new_user_ids = set(old_user_ids), set(new_user_ids)
+    removed = old_user_ids - new_user_ids
+    added = new_user_ids - old_user_ids
+    if removed:
+        await db.users.update_many({"id": {"$in": list(removed)}}, {"$pull": {"team_ids": team_id}}, session=session)
+    if added:
+        await db.users.update_many({"id": {"$in": list(added)}}, {"$addToSet": {"team_ids": team_id}}, session=session)
+
+
+async def set_user_teams(db, user_id: str, old_team_ids: Iterable[str], new_team_ids: Iterable[str], session=None) -> None:
+    """Point teams.user_ids at the user's new team list; only teams joined or left are written"""
+    old_team_ids, new_team_ids = set(old_team_ids), set(new_team_ids)
+    removed = old_team_ids - new_team_ids
+    added = new_team_ids - old_team_ids
+    if removed:
+        await db.teams.update_many({"id": {"$in": list(removed)}}, {"$pull": {"user_ids": user_id}}, session=session)
+    if added:
+        await db.teams.update_many({"id": {"$in": list(added)}}, {"$addToSet": {"user_ids": user_id}}, session=session)
+
+
+async def remove_team_references(db, team_id: str, session=None) -> None:
+    """Uses the multikey team_ids indexes, so only members and linked workspaces are visited"""
+    await db.users.update_many({"team_ids": team_id}, {"$pull": {"team_ids": team_id}}, session=session)
+    await db.workspaces.update_many({"team_ids": team_id}, {"$pull": {"team_ids": team_id}}, session=session)
+
+
+async def remove_user_references(db, user_id: str, session=None) -> None:
+    await db.teams.update_many({"user_ids": user_id}, {"$pull": {"user_ids": user_id}}, session=session)
+
+
+async def _flush(collection, operations: List[UpdateOne], dry_run: bool) -> int:
+    if not operations:
+        return 0
+    if not dry_run:
+        await collection.bulk_write(operations, ordered=False)
+    count = len(operations)
+    operations.clear()
+    return count
+
+
+async def check_membership(db, ctx=None, repair: bool = False) -> dict:
+    """Compare both sides of team membership and optionally repair drift in bulk.
+
+    teams.user_ids wins over users.team_ids; ids of users or teams that no longer
+    exist are dropped from teams, users and workspaces.
+    """
+    user_ids: Set[str] = set()
+    async for user in db.users.find({}, {"_id": 0, "id": 1}):
+        user_ids.add(user["id"])
+
+    # user id -> teams that list the user
+    expected: Dict[str, Set[str]] = {}
+    team_ids: Set[str] = set()
+    team_ops: List[UpdateOne] = []
+    stats = {"teams_fixed": 0, "users_fixed": 0, "workspaces_fixed": 0, "repaired": repair}
+
+    async for team in db.teams.find({}, {"_id": 0, "id": 1, "user_ids": 1}):
+        team_ids.add(team["id"])
+        members = team.get("user_ids") or []
+        dangling = [user_id for user_id in members if user_id not in user_ids]
+        if dangling:
+            team_ops.append(UpdateOne({"id": team["id"]}, {"$pull": {"user_ids": {"$in": dangling}}}))
+        for user_id in members:
+            if user_id in user_ids:
+                expected.setdefault(user_id, set()).add(team["id"])
+        if len(team_ops) >= MEMBERSHIP_REPAIR_BATCH_SIZE:
+            stats["teams_fixed"] += await _flush(db.teams, team_ops, not repair)
+    stats["teams_fixed"] += await _flush(db.teams, team_ops, not repair)
+
+    user_ops: List[UpdateOne] = []
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "team_ids": 1}):
+        current = user.get("team_ids") or []
+        wanted = expected.get(user["id"], set())
+        if set(current) != wanted or len(current) != len(wanted):
+            # Keep the user's existing order for teams that stay
+            ordered = [t for t in dict.fromkeys(current) if t in wanted]
+            ordered += sorted(wanted.difference(ordered))
+            user_ops.append(UpdateOne({"id": user["id"]}, {"$set": {"team_ids": ordered}}))
+        if len(user_ops) >= MEMBERSHIP_REPAIR_BATCH_SIZE:
+            stats["users_fixed"] += await _flush(db.users, user_ops, not repair)
+    stats["users_fixed"] += await _flush(db.users, user_ops, not repair)
+    if ctx is not None:
+        await ctx.progress(len(user_ids), len(user_ids), "Checking workspaces")
+
+    workspace_ops: List[UpdateOne] = []
+    async for workspace in db.workspaces.find({"team_ids.0": {"$exists": True}}, {"_id": 0, "id": 1, "team_ids": 1}):
+        dangling = [team_id for team_id in workspace["team_ids"] if team_id not in team_ids]
+        if dangling:
+            workspace_ops.append(UpdateOne({"id": workspace["id"]}, {"$pull": {"team_ids": {"$in": dangling}}}))
+        if len(workspace_ops) >= MEMBERSHIP_REPAIR_BATCH_SIZE:
+            stats["workspaces_fixed"] += await _flush(db.workspaces, workspace_ops, not repair)
+    stats["workspaces_fixed"] += await _flush(db.workspaces, workspace_ops, not repair)
+
+    if ctx is not None:
+        await ctx.progress(len(user_ids), len(user_ids), "Done")
+    logger.info(f"Membership check finished: {stats}")
+    return stats
@@ -0,0 +1,177 @@
+"""
+Typed document metadata.
+
+A workspace's metadata_ids are compiled into a MetadataSchema: one coercer per
+field name, chosen from the definition's field_type. Validation is a single
+pass over the submitted values:
+
+    text    sanitized string
+    number  int or float (numeric strings accepted, "1,5" included)
+    date    "YYYY-MM-DD" (ISO dates, ISO datetimes and DD/MM/YYYY accepted)
+    select  one of options, stored with the option's own spelling
+
+Empty values are dropped. Keys without a definition are kept as before:
+numbers and booleans as they are, anything else as sanitized text.
+
+Compiled schemas are cached per workspace and rebuilt when the workspace's
+metadata_ids change, when this worker changes a definition, or after
+METADATA_SCHEMA_TTL (definitions changed by other workers).
+"""
+
+import math
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from security import sanitize_string, MAX_DESCRIPTION_LENGTH
+
+METADATA_SCHEMA_TTL = float(os.environ.get("METADATA_SCHEMA_TTL", "60"))
+
+_DMY_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+
+class MetadataValidationError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _text(value: Any) -> str:
+    if not isinstance(value, str):
+        value = str(value)
+    return sanitize_string(value, MAX_DESCRIPTION_LENGTH)
+
+
+def _untyped(value: Any):
+    """Keys without a definition: scalars kept, everything else as text"""
+    if isinstance(value, (int, float, bool)):
+        return value
+    return _text(value)
+
+
+def _number(value: Any):
+    if isinstance(value, bool):
+        raise ValueError("must be a number")
+    if isinstance(value, (int, float)):
+        number = value
+    elif isinstance(value, str):
+        text = value.strip().replace(" ", "")
+        if "," in text and "." not in text:
+            text = text.replace(",", ".")
+        try:
+            number = int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                raise ValueError("must be a number")
+    else:
+        raise ValueError("must be a number")
+    if isinstance(number, float):
+        if not math.isfinite(number):
+            raise ValueError("must be a number")
+        if number.is_integer() and abs(number) < 2 ** 53:
+            number = int(number)
+    return number
+
+
+def _date(value: Any) -> str:
+    if isinstance(value, str):
+        text = value.strip()
+        match = _DMY_DATE.match(text)
+        try:
+            if match:
+                day, month, year = (int(part) for part in match.groups())
+                return date(year, month, day).isoformat()
+            if len(text) == 10:
+                return date.fromisoformat(text).isoformat()
+            return datetime.fromisoformat(text.replace("Z", "+00:00")).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError("must be a date (YYYY-MM-DD)")
+
+
+def _select(options: List[str]) -> Callable[[Any], str]:
+    canonical = {option.strip().casefold(): option for option in options or []}
+
+    def coerce(value: Any) -> str:
+        option = canonical.get(str(value).strip().casefold())
+        if option is None:
+            raise ValueError(f"must be one of: {', '.join(options or [])}")
+        return option
+
+    return coerce
+
+
+def compile_field(definition: dict) -> Callable[[Any], Any]:
+    field_type = definition.get("field_type")
+    if field_type == "number":
+        return _number
+    if field_type == "date":
+        return _date
+    if field_type == "select":
+        return _select(definition.get("options"))
+    return _text
+
+
+class MetadataSchema:
+    """Validator for the metadata of one workspace"""
+
+    __slots__ = ("metadata_ids", "fields", "select_fields", "expires")
+
+    def __init__(self, metadata_ids: Tuple[str, ...], definitions: List[dict]):
+        self.metadata_ids = metadata_ids
+        self.fields: Dict[str, Callable[[Any], Any]] = {
+            definition["name"]: compile_field(definition) for definition in definitions
+        }
+        self.select_fields = tuple(
+            definition["name"] for definition in definitions if definition.get("field_type") == "select"
+        )
+        self.expires = time.monotonic() + METADATA_SCHEMA_TTL
+
+    def validate(self, metadata: dict) -> dict:
+        """Coerced copy of metadata; raises MetadataValidationError listing every bad field"""
+        if not metadata or not isinstance(metadata, dict):
+            return {}
+        result = {}
+        errors = []
+        for key, value in metadata.items():
+            key = sanitize_string(str(key), 100)
+            if not key or value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            coerce = self.fields.get(key, _untyped)
+            try:
+                result[key] = coerce(value)
+            except ValueError as e:
+                errors.append(f"{key} {e}")
+        if errors:
+            raise MetadataValidationError(errors)
+        return result
+
+
+class MetadataSchemaCache:
+    def __init__(self):
+        self._schemas: Dict[str, MetadataSchema] = {}
+
+    async def get(self, db, workspace: dict) -> MetadataSchema:
+        metadata_ids = tuple(workspace.get("metadata_ids") or ())
+        schema = self._schemas.get(workspace["id"])
+        if schema is None or schema.metadata_ids != metadata_ids or schema.expires <= time.monotonic():
+            definitions = await db.metadata_definitions.find(
+                {"id": {"$in": list(metadata_ids)}}, {"_id": 0, "name": 1, "field_type": 1, "options": 1}
+            ).to_list(None)
+            schema = MetadataSchema(metadata_ids, definitions)
+            self._schemas[workspace["id"]] = schema
+        return schema
+
+    def invalidate(self, workspace_id: str = None) -> None:
+        """Drop one workspace's schema, or all of them when a definition changed"""
+        if workspace_id is None:
+            self._schemas.clear()
+        else:
+            self._schemas.pop(workspace_id, None)
+
+
+metadata_schemas = MetadataSchemaCache()
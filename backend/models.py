@@ -106,6 +106,73 @@ class Document(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class DocumentSearchResult(Document):
+    snippet: Optional[str] = None  # Matching excerpt from the file content
+    highlights: List[List[int]] = []  # [start, end) offsets of matches within snippet
+    score: Optional[float] = None  # Similarity to the query, fuzzy mode only
+
+class DocumentPartial(BaseModel):
+    """Document limited to the fields requested with ?fields="""
+    model_config = ConfigDict(extra="ignore")
+    id: Optional[str] = None
+    workspace_id: Optional[str] = None
+    file_path: Optional[str] = None
+    file_name: Optional[str] = None
+    public_url: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class DocumentSearchResultPartial(DocumentPartial):
+    snippet: Optional[str] = None
+    highlights: Optional[List[List[int]]] = None
+    score: Optional[float] = None
+
+class DocumentChanges(BaseModel):
+    documents: List[Document]  # Created or updated since the token
+    deleted: List[str]  # Ids of deleted documents
+    token: str  # Pass as ?since= on the next call
+    has_more: bool
+
+class WorkspaceBootstrap(BaseModel):
+    workspace: Workspace
+    metadata: List[MetadataDefinition]  # Definitions listed in workspace.metadata_ids
+    documents: List[Document]  # Newest first, first page only
+    document_count: int
+
+class DocumentSuggestion(BaseModel):
+    id: str
+    file_name: str
+
+class SearchCacheStats(BaseModel):
+    size: int
+    capacity: int
+    hits: int
+    misses: int  # Including stale entries
+    stale: int  # Entries skipped after a write or past their TTL
+    evictions: int
+    hit_ratio: float
+
+class AdmissionClassStats(BaseModel):
+    concurrency: int
+    max_queue: int
+    active: int
+    queued: int
+    admitted: int
+    shed_queue_full: int
+    shed_timeout: int
+    queue_ms_avg: float  # Moving average, timeouts included
+    queue_ms_max: float
+    service_ms_avg: float
+    retry_after: int  # Seconds sent with the next 503
+
+class DocumentBatchGet(BaseModel):
+    ids: List[str]
+
+class DocumentBatch(BaseModel):
+    documents: List[Document]  # In the order the ids were requested
+    missing: List[str]  # Unknown ids and documents the caller cannot access
+
 class DocumentCreate(BaseModel):
     file_path: str
     file_name: str
@@ -120,6 +187,10 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     user: User
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 # API Token models
 class ApiTokenPermission(str, Enum):
@@ -171,4 +242,32 @@ class ApiTokenCreateResponse(BaseModel):
     description: Optional[str] = None
     permissions: List[ApiTokenPermission]
     token: str  # Full token shown only at creation
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+# Background job models
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class JobProgress(BaseModel):
+    done: int = 0
+    total: Optional[int] = None
+    message: Optional[str] = None
+
+class Job(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    type: str
+    status: JobStatus
+    progress: JobProgress = JobProgress()
+    attempts: int = 0
+    max_attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,201 @@
+"""
+Push notifications for document changes, per workspace, over server-sent events.
+
+Each worker runs one ChangeHub. On a replica set the hub holds a single change
+stream over documents and document_tombstones and fans events out to every
+subscriber in the worker; the stream resumes from its last resume token after
+errors. Without a replica set the API publishes its own writes to the hub, so
+subscribers only hear about changes made through the same worker.
+
+Events only say which document changed; clients fetch the data through the
+changes feed. Every subscriber has a bounded queue: a client that falls behind
+gets a single "reset" event instead of slowing the others down, and so does a
+client reconnecting with a Last-Event-ID the hub no longer remembers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from pymongo.errors import PyMongoError
+
+from membership import supports_transactions
+
+logger = logging.getLogger(__name__)
+
+# Notification Configuration
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))  # Per subscriber
+EVENTS_HISTORY_SIZE = int(os.environ.get("EVENTS_HISTORY_SIZE", "1000"))  # Replayable with Last-Event-ID
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_RETRY_SECONDS = float(os.environ.get("EVENTS_RETRY_SECONDS", "2"))
+
+RESET = {"event": "reset", "data": {}}
+CHANGE_STREAM_LOST_CODES = (280, 286)  # ChangeStreamFatalError, ChangeStreamHistoryLost
+
+
+def format_event(message: dict) -> str:
+    lines = []
+    if message.get("id"):
+        lines.append(f"id: {message['id']}")
+    lines.append(f"event: {message['event']}")
+    lines.append(f"data: {json.dumps(message['data'], separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    def __init__(self, workspace_id: str, queue_size: int):
+        self.workspace_id = workspace_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog, the client resyncs from the changes feed
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class ChangeHub:
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, history_size: int = EVENTS_HISTORY_SIZE):
+        self.queue_size = queue_size
+        self.boot_id = uuid.uuid4().hex[:12]  # Event ids from another worker or run don't resume here
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+
+    @property
+    def watching(self) -> bool:
+        return self._watch_task is not None
+
+    async def start(self, client, db) -> None:
+        if await supports_transactions(client):
+            self._watch_task = asyncio.create_task(self._watch(db))
+            logger.info("Document change notifications fed by a change stream")
+        else:
+            logger.info("No replica set: document change notifications cover this worker's writes only")
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def add_listener(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Called with the workspace id of every change, or None when changes may have been missed"""
+        self._listeners.append(listener)
+
+    def notify(self, workspace_id: str, operation: str, document_id: str) -> None:
+        """Called after API writes; only listeners hear it while a change stream reports every write"""
+        if not self.watching:
+            self._publish(workspace_id, operation, document_id)
+        else:
+            # Without waiting for the stream to echo the write back
+            for listener in self._listeners:
+                listener(workspace_id)
+
+    def _publish(self, workspace_id: str, operation: str, document_id: str) -> None:
+        self._seq += 1
+        message = {
+            "id": f"{self.boot_id}:{self._seq}",
+            "event": "change",
+            "data": {"operation": operation, "document_id": document_id},
+        }
+        self._history.append((self._seq, workspace_id, message))
+        for listener in self._listeners:
+            listener(workspace_id)
+        for subscriber in self._subscribers.get(workspace_id, ()):
+            subscriber.offer(message)
+
+    def _reset_all(self) -> None:
+        for listener in self._listeners:
+            listener(None)
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                subscriber.offer(RESET)
+
+    def _missed_since(self, workspace_id: str, last_event_id: str) -> Optional[list]:
+        """Events after last_event_id, or None when they can't be replayed"""
+        boot_id, _, seq = last_event_id.partition(":")
+        if boot_id != self.boot_id or not seq.isdigit():
+            return None
+        last_seq = int(seq)
+        if self._history and self._history[0][0] > last_seq + 1:
+            return None
+        return [message for s, ws, message in self._history if s > last_seq and ws == workspace_id]
+
+    async def subscribe(self, workspace_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """SSE stream for one client, with replay on reconnect and heartbeat comments"""
+        subscriber = Subscriber(workspace_id, self.queue_size)
+        self._subscribers.setdefault(workspace_id, set()).add(subscriber)
+        try:
+            yield f"retry: {int(EVENTS_RETRY_SECONDS * 1000)}\n\n"
+            if last_event_id:
+                missed = self._missed_since(workspace_id, last_event_id)
+                for message in missed if missed is not None else [RESET]:
+                    yield format_event(message)
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(message)
+        finally:
+            subscribers = self._subscribers.get(workspace_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[workspace_id]
+
+    async def _watch(self, db) -> None:
+        pipeline = [
+            {"$match": {"$or": [
+                {"ns.coll": "documents", "operationType": {"$in": ["insert", "replace"]}},
+                # Skip background writes (thumbnails) that don't change the API record
+                {"ns.coll": "documents", "operationType": "update",
+                 "updateDescription.updatedFields.updated_at": {"$exists": True}},
+                {"ns.coll": "document_tombstones", "operationType": "insert"},
+            ]}},
+            {"$project": {
+                "operationType": 1, "ns": 1,
+                "fullDocument.id": 1, "fullDocument.workspace_id": 1, "fullDocument.document_id": 1,
+            }},
+        ]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup", resume_after=self._resume_token) as stream:
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted, resuming: {e}")
+                if getattr(e, "code", None) in CHANGE_STREAM_LOST_CODES:
+                    # Resume point fell off the oplog: start fresh, clients resync
+                    self._resume_token = None
+                    self._reset_all()
+                await asyncio.sleep(EVENTS_RETRY_SECONDS)
+
+    def _dispatch(self, change: dict) -> None:
+        doc = change.get("fullDocument")
+        if not doc:
+            return  # Updated document already deleted; its tombstone follows
+        if change["ns"]["coll"] == "document_tombstones":
+            self._publish(doc["workspace_id"], "delete", doc["document_id"])
+        else:
+            operation = "insert" if change["operationType"] == "insert" else "update"
+            self._publish(doc["workspace_id"], operation, doc["id"])
+
+
+change_hub = ChangeHub()
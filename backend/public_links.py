@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+# Positive cache: public_url -> resolved file, bounded LRU with TTL. Deletes on
+# other workers are only seen when an entry expires, so the TTL stays short.
+PUBLIC_LINK_CACHE_SIZE = int(os.environ.get("PUBLIC_LINK_CACHE_SIZE", "10000"))
+PUBLIC_LINK_CACHE_TTL = float(os.environ.get("PUBLIC_LINK_CACHE_TTL", "5"))
+
+# Negative filter: minimum interval between catch-up queries for links created by
+# other workers (misses wait for the next one), and the target false-positive rate
+PUBLIC_LINK_SYNC_SECONDS = float(os.environ.get("PUBLIC_LINK_SYNC_SECONDS", "0.5"))
+PUBLIC_LINK_FILTER_ERROR_RATE = float(os.environ.get("PUBLIC_LINK_FILTER_ERROR_RATE", "0.01"))
+# Full rebuilds drop deleted links and pick up rows written outside the API
+PUBLIC_LINK_REBUILD_SECONDS = float(os.environ.get("PUBLIC_LINK_REBUILD_SECONDS", "3600"))
+
+# created_at is stamped before the insert lands, so catch-up queries look back a little
+SYNC_LOOKBACK = timedelta(seconds=5)
+
+# CDN-friendly caching for valid public links; also how long a deleted document stays reachable
+PUBLIC_CACHE_MAX_AGE = int(os.environ.get("PUBLIC_CACHE_MAX_AGE", "60"))
+PUBLIC_CACHE_S_MAXAGE = int(os.environ.get("PUBLIC_CACHE_S_MAXAGE", "60"))
+PUBLIC_CACHE_CONTROL = f"public, max-age={PUBLIC_CACHE_MAX_AGE}, s-maxage={PUBLIC_CACHE_S_MAXAGE}"
+
+
+class PublicLink:
+    """Resolved public document: local file with its stat, an object-stored upload, or an external URL"""
+
+    __slots__ = ("file_path", "file_name", "stat_result", "etag", "expires")
+
+    def __init__(self, file_path: str, file_name: str, stat_result: Optional[os.stat_result] = None):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.stat_result = stat_result
+        self.etag = None
+        if stat_result is not None:
+            # Same derivation as Starlette's FileResponse so both agree
+            etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+            self.etag = f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+        self.expires = time.monotonic() + PUBLIC_LINK_CACHE_TTL
+
+    @property
+    def is_external(self) -> bool:
+        return self.file_path.startswith(('http://', 'https://'))
+
+
+class PublicLinkIndex:
+    """Per-worker cache and negative-lookup filter for public document links.
+
+    The filter is rebuilt from Mongo at startup. Links created in this worker are
+    added immediately; links created by other workers are picked up by a catch-up
+    query on created_at. A lookup that misses waits for a catch-up that started
+    after it arrived and is rejected if the link is still absent. Concurrent
+    misses share one catch-up, and catch-ups start at most once per
+    PUBLIC_LINK_SYNC_SECONDS, so guessed links cost Mongo one small query per
+    interval however many arrive. Bloom filters can't remove keys, so deleted links stay as
+    false positives (costing one Mongo lookup) until the next periodic rebuild.
+    Rows bulk-loaded with old created_at values (seed_dataset.py, restores) are
+    only seen after a rebuild or restart.
+    """
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self.cache: "OrderedDict[str, PublicLink]" = OrderedDict()
+        self.watermark = ""
+        self.last_sync = 0.0  # When the last catch-up query started
+        self.last_rebuild = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._sync_started: Optional[float] = None  # Query start of the catch-up in flight
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._pending: Optional[list] = None
+
+    # Positive cache
+    def get(self, public_url: str) -> Optional[PublicLink]:
+        link = self.cache.get(public_url)
+        if link is None:
+            return None
+        if link.expires < time.monotonic():
+            del self.cache[public_url]
+            return None
+        self.cache.move_to_end(public_url)
+        return link
+
+    def put(self, public_url: str, link: PublicLink) -> PublicLink:
+        self.cache[public_url] = link
+        self.cache.move_to_end(public_url)
+        while len(self.cache) > PUBLIC_LINK_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return link
+
+    def invalidate(self, public_url: Optional[str] = None) -> None:
+        """Drop one cached link, or all of them when no public_url is given"""
+        if public_url is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(public_url, None)
+
+    # Negative filter
+    def add(self, public_url: str, created_at: Optional[str] = None) -> None:
+        if self.filter is not None:
+            self.filter.add(public_url)
+        if self._pending is not None:
+            self._pending.append(public_url)
+        if created_at and created_at > self.watermark:
+            self.watermark = created_at
+
+    async def rebuild(self, db) -> None:
+        """Stream every public_url into a fresh filter and swap it in"""
+        started = time.monotonic()
+        scan_start = datetime.now(timezone.utc).isoformat()
+        self._pending = []
+        try:
+            total = await db.documents.estimated_document_count()
+            new_filter = BloomFilter(total * 2, PUBLIC_LINK_FILTER_ERROR_RATE)
+            cursor = db.documents.find({}, {"_id": 0, "public_url": 1}).batch_size(10000)
+            async for doc in cursor:
+                if doc.get("public_url"):
+                    new_filter.add(doc["public_url"])
+            # Links added by this worker while the scan ran
+            for public_url in self._pending:
+                new_filter.add(public_url)
+        finally:
+            self._pending = None
+        self.filter = new_filter
+        self.last_rebuild = time.monotonic()
+        # Anything inserted during the scan is picked up by the next catch-up query
+        self.watermark = scan_start
+        self.last_sync = 0.0
+        logger.info(
+            "Public link filter rebuilt: %d links, %d KB in %.2fs",
+            new_filter.count, len(new_filter.bits) // 1024, time.monotonic() - started
+        )
+
+    def schedule_rebuild(self, db) -> None:
+        if self._rebuild_task is None or self._rebuild_task.done():
+            self._rebuild_task = asyncio.create_task(self.rebuild(db))
+
+    async def sync(self, db) -> None:
+        """Add links created since the watermark (e.g. by other workers)"""
+        self._sync_started = None
+        wait = self.last_sync + PUBLIC_LINK_SYNC_SECONDS - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._sync_started = self.last_sync = time.monotonic()
+        since = self.watermark
+        if since:
+            since = (datetime.fromisoformat(since) - SYNC_LOOKBACK).isoformat()
+        cursor = db.documents.find(
+            {"created_at": {"$gte": since}},
+            {"_id": 0, "public_url": 1, "created_at": 1}
+        )
+        async for doc in cursor:
+            self.add(doc["public_url"], doc.get("created_at"))
+        if self.filter is not None and (
+            self.filter.saturated or time.monotonic() - self.last_rebuild >= PUBLIC_LINK_REBUILD_SECONDS
+        ):
+            self.schedule_rebuild(db)
+
+    async def _catch_up(self, db, since: float) -> None:
+        """Wait until a catch-up that started at or after since has finished"""
+        while True:
+            task = self._sync_task
+            if task is None or task.done():
+                if self.last_sync >= since:
+                    return
+                self._sync_started = None
+                task = self._sync_task = asyncio.create_task(self.sync(db))
+            started = self._sync_started
+            await asyncio.shield(task)
+            if started is None or started >= since:
+                return
+
+    async def might_exist(self, db, public_url: str) -> bool:
+        """False only when the link is certainly not a valid public URL"""
+        if self.filter is None:
+            return True
+        if public_url in self.filter:
+            return True
+        try:
+            await self._catch_up(db, time.monotonic())
+        except Exception as e:
+            logger.warning(f"Public link catch-up failed: {e}")
+            return True
+        return public_url in self.filter
+
+public_links = PublicLinkIndex()
@@ -0,0 +1,104 @@
+"""
+Read routing to replica set secondaries.
+
+With READ_PREFERENCE=secondaryPreferred, document reads that tolerate some
+lag (listing, search, batch get) go to secondaries no more than
+READ_MAX_STALENESS_SECONDS behind the primary. Authentication, access checks
+and the changes feed always read from the primary. The default, primary,
+leaves every read where it was.
+
+Read-your-writes: document writes run in a causally consistent session, and
+the writer's cluster and operation times are remembered for
+READ_YOUR_WRITES_SECONDS. Their routed reads in that window run in a causal
+session advanced to those times, so a secondary waits until it has applied
+the write before answering. Those reads also skip the shared search cache,
+whose entries may come from a lagging secondary. The times are kept per
+worker; a read served by another worker is only bounded by the staleness
+limit.
+
+Local three-member replica set: tests/replica_set/docker-compose.yml.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Read Routing Configuration
+READ_PREFERENCE = os.environ.get("READ_PREFERENCE", "primary")
+READ_MAX_STALENESS_SECONDS = int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))  # MongoDB's minimum is 90
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "120"))
+READ_YOUR_WRITES_MAX_WRITERS = 100000
+
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(mode: str, max_staleness: int):
+    if mode == "primary":
+        return Primary()
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown READ_PREFERENCE {mode!r}, expected primary or one of: {', '.join(READ_PREFERENCES)}")
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+class ReadRouter:
+    def __init__(self, client, db, mode: str = READ_PREFERENCE, max_staleness: int = READ_MAX_STALENESS_SECONDS,
+                 window: float = READ_YOUR_WRITES_SECONDS):
+        self.client = client
+        self.primary = db
+        self.routed = mode != "primary"
+        self.replica = client.get_database(db.name, read_preference=read_preference(mode, max_staleness)) if self.routed else db
+        self.window = window
+        self._writes: "OrderedDict[str, Tuple[dict, object, float]]" = OrderedDict()
+
+    @asynccontextmanager
+    async def write_session(self, principal: str):
+        """Session for a document write that principal must be able to read back"""
+        if not self.routed:
+            yield None
+            return
+        async with await self.client.start_session(causal_consistency=True) as session:
+            yield session
+            if session.operation_time is not None and session.cluster_time is not None:
+                self._remember(principal, session.cluster_time, session.operation_time)
+
+    @asynccontextmanager
+    async def read_session(self, principal: str):
+        """(database, session) for reads that a secondary may serve"""
+        write = self._recent_write(principal) if self.routed else None
+        if write is None:
+            yield self.replica, None
+            return
+        async with await self.client.start_session(causal_consistency=True) as session:
+            cluster_time, operation_time = write
+            session.advance_cluster_time(cluster_time)
+            session.advance_operation_time(operation_time)
+            yield self.replica, session
+
+    def has_recent_write(self, principal: str) -> bool:
+        """True while principal's routed reads must wait for their own writes;
+        results shared between principals (search cache) can't be used then"""
+        return self.routed and self._recent_write(principal) is not None
+
+    def _remember(self, principal: str, cluster_time: dict, operation_time) -> None:
+        self._writes[principal] = (cluster_time, operation_time, time.monotonic() + self.window)
+        self._writes.move_to_end(principal)
+        while len(self._writes) > READ_YOUR_WRITES_MAX_WRITERS:
+            self._writes.popitem(last=False)
+
+    def _recent_write(self, principal: str) -> Optional[Tuple[dict, object]]:
+        write = self._writes.get(principal)
+        if write is None:
+            return None
+        if write[2] < time.monotonic():
+            del self._writes[principal]
+            return None
+        return write[0], write[1]
@@ -0,0 +1,109 @@
+"""
+Rotating refresh tokens.
+
+Login hands out a short-lived access token (JWT) and an opaque refresh token.
+Only the SHA-256 of a refresh token is stored, so renewing a session is one
+indexed lookup instead of a bcrypt check. Every refresh marks the presented
+token as used and issues a successor in the same family.
+
+Presenting a used token again means it was copied: the whole family is
+revoked and both holders have to log in again. A token reused within
+REFRESH_TOKEN_REUSE_GRACE_SECONDS of its rotation is treated as a concurrent
+refresh (two tabs renewing at once) and gets its own successor instead.
+"""
+
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from ids import new_id
+from security import REFRESH_TOKEN_EXPIRE_DAYS, REFRESH_TOKEN_REUSE_GRACE_SECONDS
+
+REFRESH_TOKEN_BYTES = 48
+
+
+class InvalidRefreshToken(Exception):
+    """Unknown, expired or revoked refresh token"""
+
+
+class RefreshTokenReused(InvalidRefreshToken):
+    """A rotated token was presented again; its family has been revoked"""
+
+    def __init__(self, user_id: str, family_id: str):
+        super().__init__(family_id)
+        self.user_id = user_id
+        self.family_id = family_id
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def ensure_refresh_token_indexes(db) -> None:
+    await db.refresh_tokens.create_index("token_hash", unique=True)
+    await db.refresh_tokens.create_index("family_id")
+    await db.refresh_tokens.create_index("user_id")
+    await db.refresh_tokens.create_index("expire_at", expireAfterSeconds=0)
+
+
+async def issue_refresh_token(db, user_id: str, family_id: str = None) -> str:
+    """New refresh token for user_id; family_id continues an existing session"""
+    token = secrets.token_urlsafe(REFRESH_TOKEN_BYTES)
+    now = datetime.now(timezone.utc)
+    await db.refresh_tokens.insert_one({
+        "token_hash": hash_refresh_token(token),
+        "user_id": user_id,
+        "family_id": family_id or new_id(),
+        "created_at": now.isoformat(),
+        "used_at": None,
+        "expire_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return token
+
+
+async def rotate_refresh_token(db, token: str) -> Tuple[str, str]:
+    """Spend token and return (user_id, successor token).
+
+    Raises InvalidRefreshToken, or RefreshTokenReused after revoking the family.
+    """
+    now = datetime.now(timezone.utc)
+    token_hash = hash_refresh_token(token)
+    # Atomic claim: of two concurrent requests only one sees used_at unset
+    record = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "used_at": None},
+        {"$set": {"used_at": now}},
+        projection={"_id": 0},
+    )
+    if record is None:
+        record = await db.refresh_tokens.find_one({"token_hash": token_hash}, {"_id": 0})
+        if record is None:
+            raise InvalidRefreshToken()
+        used_at = record["used_at"].replace(tzinfo=timezone.utc)
+        if now - used_at > timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS):
+            await revoke_family(db, record["family_id"])
+            raise RefreshTokenReused(record["user_id"], record["family_id"])
+
+    # The TTL monitor runs once a minute, so expiry is checked here too
+    if record["expire_at"].replace(tzinfo=timezone.utc) <= now:
+        raise InvalidRefreshToken()
+    successor = await issue_refresh_token(db, record["user_id"], record["family_id"])
+    return record["user_id"], successor
+
+
+async def revoke_family(db, family_id: str) -> None:
+    await db.refresh_tokens.delete_many({"family_id": family_id})
+
+
+async def revoke_refresh_token(db, token: str) -> bool:
+    """Logout: ends the session the token belongs to"""
+    record = await db.refresh_tokens.find_one({"token_hash": hash_refresh_token(token)}, {"_id": 0, "family_id": 1})
+    if record is None:
+        return False
+    await revoke_family(db, record["family_id"])
+    return True
+
+
+async def revoke_user_refresh_tokens(db, user_id: str, session=None) -> None:
+    """Ends every session of the user (password change, account deletion)"""
+    await db.refresh_tokens.delete_many({"user_id": user_id}, session=session)
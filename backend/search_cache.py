@@ -0,0 +1,105 @@
+"""
+Per-worker cache of search result pages.
+
+Entries are keyed by mode, normalized query, requested fields, page and the
+set of workspaces the caller can search, so users with the same access share
+entries and nobody sees results from workspaces outside their own set.
+
+Every workspace has a generation counter, bumped on each document change
+reported by the change hub (all workers' writes on a replica set, this
+worker's otherwise) and when extracted content is stored. An entry remembers
+the sum of its workspaces' generations when its search started; counters only
+grow, so a different sum on lookup means a write happened and the entry is
+skipped. Entries also expire after SEARCH_CACHE_TTL to bound staleness from
+changes the hub doesn't see.
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+# Search Cache Configuration
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1000"))  # Pages per worker, 0 disables
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "30"))
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def scope_key(workspace_ids: Iterable[str]) -> str:
+    """Digest of an access scope; a collision would share results across scopes, so no short hash"""
+    return hashlib.sha256("\n".join(sorted(workspace_ids)).encode()).hexdigest()
+
+
+class SearchCacheEntry:
+    __slots__ = ("stamp", "expires", "value")
+
+    def __init__(self, stamp: Tuple[int, int], value):
+        self.stamp = stamp
+        self.expires = time.monotonic() + SEARCH_CACHE_TTL
+        self.value = value
+
+
+class SearchResultCache:
+    def __init__(self, size: int = SEARCH_CACHE_SIZE):
+        self.size = size
+        self.entries: "OrderedDict[tuple, SearchCacheEntry]" = OrderedDict()
+        self.generations: Dict[str, int] = {}
+        self.epoch = 0  # Bumped when every workspace may have changed
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def stamp(self, workspace_ids: Iterable[str]) -> Tuple[int, int]:
+        """Taken before searching, so writes during the search make the entry stale"""
+        generations = self.generations
+        return self.epoch, sum(generations.get(workspace_id, 0) for workspace_id in workspace_ids)
+
+    def get(self, key: tuple, stamp: Tuple[int, int]):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.stamp != stamp or entry.expires < time.monotonic():
+            del self.entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: tuple, stamp: Tuple[int, int], value) -> None:
+        if self.size <= 0:
+            return
+        self.entries[key] = SearchCacheEntry(stamp, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def bump(self, workspace_id: Optional[str] = None) -> None:
+        """A workspace's documents changed; None when any may have"""
+        if workspace_id is None:
+            self.epoch += 1
+        else:
+            self.generations[workspace_id] = self.generations.get(workspace_id, 0) + 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+search_cache = SearchResultCache()
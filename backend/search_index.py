@@ -0,0 +1,394 @@
+"""
+In-memory search indexes per workspace: typeahead and fuzzy search.
+
+Each worker keeps, per workspace, the sorted list of distinct folded tokens
+(accents stripped, lowercase) of the file names and, for every token, a compact
+array of document ordinals. Ordinals grow with created_at, so the newest
+matches are simply the largest ordinals.
+
+    typeahead  the last query token is a prefix (bisect over the sorted
+               tokens), every earlier token a whole word
+    fuzzy      every query token is matched to similar words through a trigram
+               index over the vocabulary (fuzzy.py), covering file names and
+               the values of select-type metadata fields
+
+Indexes are built on first use and rebuilt in the background after
+SEARCH_INDEX_REFRESH_SECONDS, which picks up writes made by other workers and
+outside the API; this worker's own writes are applied immediately. Memory is
+bounded by SEARCH_INDEX_MAX_ENTRIES (token, document) pairs per worker: least
+recently used workspaces are dropped first, except those an in-flight fuzzy
+query still needs, and a workspace larger than the budget keeps only its
+newest documents.
+"""
+
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fuzzy import TrigramVocabulary, FUZZY_THRESHOLD
+from metadata_schema import metadata_schemas
+from textutils import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Search Index Configuration
+SEARCH_INDEX_MAX_ENTRIES = int(os.environ.get("SEARCH_INDEX_MAX_ENTRIES", "2000000"))  # Per worker, all workspaces
+SEARCH_INDEX_REFRESH_SECONDS = float(os.environ.get("SEARCH_INDEX_REFRESH_SECONDS", "300"))
+SEARCH_INDEX_BUILD_CONCURRENCY = int(os.environ.get("SEARCH_INDEX_BUILD_CONCURRENCY", "4"))  # Per fuzzy query
+TYPEAHEAD_MAX_RESULTS = 20
+MIN_PREFIX_LENGTH = 2
+WALK_LIMIT = 2000  # Candidates probed before falling back to set intersection
+
+
+def select_values(metadata: Optional[dict], select_fields: Iterable[str]) -> tuple:
+    """Values of a document's select-type metadata fields"""
+    if not metadata:
+        return ()
+    return tuple(str(metadata[field]) for field in select_fields if metadata.get(field) is not None)
+
+
+class WorkspaceSearchIndex:
+    __slots__ = ("tokens", "postings", "value_postings", "vocabulary", "ids", "names", "values", "ordinals",
+                 "entries", "built_at", "last_used")
+
+    def __init__(self):
+        self.tokens: List[str] = []  # Sorted distinct file name tokens
+        self.postings: Dict[str, array] = {}  # file name token -> ordinals
+        self.value_postings: Dict[str, array] = {}  # select value token -> ordinals
+        self.vocabulary = TrigramVocabulary()  # Every token of both kinds
+        self.ids: List[Optional[str]] = []  # ordinal -> document id, None once removed
+        self.names: List[Optional[str]] = []  # ordinal -> file name
+        self.values: List[tuple] = []  # ordinal -> select values
+        self.ordinals: Dict[str, int] = {}  # document id -> ordinal
+        self.entries = 0
+        self.built_at = time.monotonic()
+        self.last_used = self.built_at
+
+    def add(self, document_id: str, file_name: str, values: tuple = (), keep_sorted: bool = True) -> None:
+        """keep_sorted=False appends new tokens unsorted; bulk loads sort once at the end.
+
+        A document already indexed keeps its ordinal, so an update does not make it the newest.
+        """
+        ordinal = self.ordinals.get(document_id)
+        if ordinal is None:
+            ordinal = len(self.ids)
+            self.ids.append(document_id)
+            self.names.append(file_name)
+            self.values.append(values)
+            self.ordinals[document_id] = ordinal
+            insert = array.append
+        else:
+            self._unindex(ordinal)
+            self.names[ordinal] = file_name
+            self.values[ordinal] = values
+            insert = bisect.insort
+        for token in set(tokenize(file_name)):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array("I")
+                if keep_sorted:
+                    bisect.insort(self.tokens, token)
+                else:
+                    self.tokens.append(token)
+                self.vocabulary.add(token)
+            insert(posting, ordinal)
+            self.entries += 1
+        for token in set(tokenize(" ".join(values))):
+            posting = self.value_postings.get(token)
+            if posting is None:
+                posting = self.value_postings[token] = array("I")
+                self.vocabulary.add(token)
+            insert(posting, ordinal)
+            self.entries += 1
+
+    def remove(self, document_id: str) -> None:
+        ordinal = self.ordinals.pop(document_id, None)
+        if ordinal is None:
+            return
+        self._unindex(ordinal)
+        self.ids[ordinal] = None
+        self.names[ordinal] = None
+        self.values[ordinal] = ()
+
+    def _unindex(self, ordinal: int) -> None:
+        """Drop an ordinal from every posting it appears in"""
+        for token in set(tokenize(self.names[ordinal])):
+            if self._discard(self.postings, token, ordinal):
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+        for token in set(tokenize(" ".join(self.values[ordinal]))):
+            self._discard(self.value_postings, token, ordinal)
+
+    def _discard(self, postings: Dict[str, array], token: str, ordinal: int) -> bool:
+        """Remove ordinal from a token's posting; True when the token is gone"""
+        posting = postings.get(token)
+        if posting is None:
+            return False
+        posting.remove(ordinal)
+        self.entries -= 1
+        if posting:
+            return False
+        del postings[token]
+        if token not in self.postings and token not in self.value_postings:
+            self.vocabulary.remove(token)
+        return True
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.tokens, prefix)
+        return self.tokens[start:bisect.bisect_left(self.tokens, prefix + "\uffff")]
+
+    def _newest_with_prefix(self, prefix: str, limit: int) -> List[int]:
+        """Postings are ascending, so merging them from the end yields the newest first"""
+        streams = [reversed(self.postings[token]) for token in self._prefix_tokens(prefix)]
+        result = []
+        for ordinal in heapq.merge(*streams, reverse=True):
+            if not result or result[-1] != ordinal:
+                result.append(ordinal)
+                if len(result) == limit:
+                    break
+        return result
+
+    def _newest_with_words(self, words: List[array], prefix: str, limit: int) -> List[int]:
+        """Walk the rarest word's postings from the end, probing the others by bisection"""
+        rarest, others = words[0], words[1:]
+        result = []
+        for walked, ordinal in enumerate(reversed(rarest)):
+            if walked == WALK_LIMIT:
+                return self._intersect(words, prefix, limit)
+            if all(_contains(posting, ordinal) for posting in others) and any(
+                    token.startswith(prefix) for token in tokenize(self.names[ordinal])):
+                result.append(ordinal)
+                if len(result) == limit:
+                    break
+        return result
+
+    def _intersect(self, words: List[array], prefix: str, limit: int) -> List[int]:
+        """Set intersection for rare combinations of common words"""
+        candidates = set(words[0])
+        for posting in words[1:]:
+            candidates.intersection_update(posting)
+        matches = set()
+        for token in self._prefix_tokens(prefix):
+            matches.update(self.postings[token])
+        return heapq.nlargest(limit, candidates & matches)
+
+    def suggest(self, query: str, limit: int) -> List[dict]:
+        self.last_used = time.monotonic()
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        prefix = query_tokens[-1]
+        # Every earlier token must be a whole word; the rarest one drives the walk
+        words = sorted((self.postings.get(token) for token in query_tokens[:-1]), key=lambda p: len(p or ()))
+        if words and not words[0]:
+            return []
+        if words:
+            ordinals = self._newest_with_words(words, prefix, limit)
+        else:
+            ordinals = self._newest_with_prefix(prefix, limit)
+        return [{"id": self.ids[ordinal], "file_name": self.names[ordinal]} for ordinal in ordinals]
+
+    def fuzzy(self, query: str, limit: int, threshold: float = FUZZY_THRESHOLD) -> List[Tuple[str, float]]:
+        """(document id, score) best first; score averages each query word's best similarity.
+
+        Threshold algorithm: every query word streams its documents best match
+        first, each new document is scored against the other words with bisect
+        probes, and the walk stops once nothing unseen can beat the top limit.
+        """
+        self.last_used = time.monotonic()
+        similar = [self.vocabulary.similar(token, threshold) for token in dict.fromkeys(tokenize(query))]
+        if not similar:
+            return []
+        streams = [self._ranked(words) for words in similar]
+        bounds = [words[0][1] if words else 0.0 for words in similar]
+        seen = set()
+        top: List[Tuple[float, int]] = []  # Min-heap of (score, ordinal)
+        active = [i for i, words in enumerate(similar) if words]
+        while active and sum(bounds) / len(similar) >= threshold:
+            for i in list(active):
+                item = next(streams[i], None)
+                if item is None:
+                    bounds[i] = 0.0
+                    active.remove(i)
+                    continue
+                bounds[i], ordinal = item
+                if ordinal in seen:
+                    continue
+                seen.add(ordinal)
+                score = sum(
+                    bounds[i] if j == i else self._word_score(ordinal, words) for j, words in enumerate(similar)
+                ) / len(similar)
+                if score < threshold:
+                    continue
+                if len(top) < limit:
+                    heapq.heappush(top, (score, ordinal))
+                elif (score, ordinal) > top[0]:
+                    heapq.heapreplace(top, (score, ordinal))
+            if len(top) == limit and top[0][0] >= sum(bounds) / len(similar):
+                break
+        return [(self.ids[ordinal], round(score, 3)) for score, ordinal in sorted(top, reverse=True)]
+
+    def _ranked(self, words: List[Tuple[str, float]]):
+        """(score, ordinal) for the documents containing any of words, best word first, newest first"""
+        emitted = set()
+        for word, score in words:
+            postings = [reversed(p) for p in (self.postings.get(word), self.value_postings.get(word)) if p]
+            for ordinal in heapq.merge(*postings, reverse=True):
+                if ordinal not in emitted:
+                    emitted.add(ordinal)
+                    yield score, ordinal
+
+    def _word_score(self, ordinal: int, words: List[Tuple[str, float]]) -> float:
+        for word, score in words:
+            for postings in (self.postings, self.value_postings):
+                posting = postings.get(word)
+                if posting and _contains(posting, ordinal):
+                    return score
+        return 0.0
+
+
+def _contains(posting: array, ordinal: int) -> bool:
+    i = bisect.bisect_left(posting, ordinal)
+    return i < len(posting) and posting[i] == ordinal
+
+
+class SearchIndex:
+    """Per-worker search indexes for the workspaces that are being searched"""
+
+    def __init__(self, max_entries: int = SEARCH_INDEX_MAX_ENTRIES, refresh_seconds: float = SEARCH_INDEX_REFRESH_SECONDS):
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self._indexes: Dict[str, WorkspaceSearchIndex] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._pending: Dict[str, list] = {}  # Writes made while an index is being built
+        self._pinned: Dict[str, int] = {}  # Workspaces an in-flight query still needs; never evicted
+
+    @property
+    def entries(self) -> int:
+        return sum(index.entries for index in self._indexes.values())
+
+    async def suggest(self, db, workspace_id: str, query: str, limit: int = 10) -> List[dict]:
+        index = await self._get(db, workspace_id)
+        return index.suggest(query, min(limit, TYPEAHEAD_MAX_RESULTS))
+
+    async def fuzzy(self, db, workspace_ids: List[str], query: str, limit: int,
+                    max_loads: int) -> Tuple[List[Tuple[str, float]], int]:
+        """Best limit matches of each workspace, and how many workspaces were skipped.
+
+        Loaded indexes are always searched; at most max_loads missing ones are
+        built, SEARCH_INDEX_BUILD_CONCURRENCY at a time, in id order so repeated
+        queries warm up the rest. None of the searched workspaces is evicted
+        while the query runs.
+        """
+        cold = sorted(workspace_id for workspace_id in workspace_ids if workspace_id not in self._indexes)
+        searched = [workspace_id for workspace_id in workspace_ids if workspace_id in self._indexes] + cold[:max_loads]
+        semaphore = asyncio.Semaphore(SEARCH_INDEX_BUILD_CONCURRENCY)
+
+        async def search(workspace_id: str) -> List[Tuple[str, float]]:
+            async with semaphore:
+                index = await self._get(db, workspace_id)
+            return index.fuzzy(query, limit)
+
+        for workspace_id in searched:
+            self._pinned[workspace_id] = self._pinned.get(workspace_id, 0) + 1
+        try:
+            results = await asyncio.gather(*(search(workspace_id) for workspace_id in searched))
+        finally:
+            for workspace_id in searched:
+                self._pinned[workspace_id] -= 1
+                if not self._pinned[workspace_id]:
+                    del self._pinned[workspace_id]
+        return [match for matches in results for match in matches], len(workspace_ids) - len(searched)
+
+    async def _get(self, db, workspace_id: str) -> WorkspaceSearchIndex:
+        index = self._indexes.get(workspace_id)
+        if index is None:
+            index = await self._load(db, workspace_id)
+        elif time.monotonic() - index.built_at > self.refresh_seconds and workspace_id not in self._loading:
+            # Serve the current index while a fresh one is built
+            self._start_load(db, workspace_id)
+        return index
+
+    def _start_load(self, db, workspace_id: str) -> asyncio.Task:
+        self._pending[workspace_id] = []
+        task = asyncio.create_task(self._build(db, workspace_id))
+        self._loading[workspace_id] = task
+        task.add_done_callback(lambda t: self._load_done(workspace_id, t))
+        return task
+
+    def _load_done(self, workspace_id: str, task: asyncio.Task) -> None:
+        self._loading.pop(workspace_id, None)
+        self._pending.pop(workspace_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Search index for workspace {workspace_id} failed: {task.exception()}")
+
+    async def _load(self, db, workspace_id: str) -> WorkspaceSearchIndex:
+        # Concurrent first requests share one build
+        task = self._loading.get(workspace_id) or self._start_load(db, workspace_id)
+        return await asyncio.shield(task)
+
+    async def _build(self, db, workspace_id: str) -> WorkspaceSearchIndex:
+        started = time.monotonic()
+        workspace = await db.workspaces.find_one({"id": workspace_id}, {"_id": 0, "id": 1, "metadata_ids": 1})
+        schema = await metadata_schemas.get(db, workspace or {"id": workspace_id})
+        projection = {"_id": 0, "id": 1, "file_name": 1}
+        projection.update({f"metadata.{field}": 1 for field in schema.select_fields})
+
+        budget = self.max_entries
+        newest_first = []
+        cursor = db.documents.find({"workspace_id": workspace_id}, projection).sort("created_at", -1).batch_size(5000)
+        async for doc in cursor:
+            values = select_values(doc.get("metadata"), schema.select_fields)
+            budget -= len(set(tokenize(doc["file_name"]))) + len(values)
+            if budget < 0:
+                logger.warning(f"Search index for workspace {workspace_id} limited to its newest {len(newest_first)} documents")
+                break
+            newest_first.append((doc["id"], doc["file_name"], values))
+        await cursor.close()
+
+        index = WorkspaceSearchIndex()
+        for document_id, file_name, values in reversed(newest_first):
+            index.add(document_id, file_name, values, keep_sorted=False)
+        index.tokens.sort()
+        for operation, args in self._pending.get(workspace_id, ()):
+            getattr(index, operation)(*args)
+        self._indexes[workspace_id] = index
+        self._evict(keep=workspace_id)
+        logger.info(f"Search index for workspace {workspace_id}: {len(newest_first)} documents, "
+                    f"{index.entries} entries in {time.monotonic() - started:.2f}s")
+        return index
+
+    def _evict(self, keep: str) -> None:
+        total = self.entries
+        for workspace_id in sorted(self._indexes, key=lambda ws: self._indexes[ws].last_used):
+            if total <= self.max_entries:
+                break
+            if workspace_id != keep and workspace_id not in self._pinned:
+                total -= self._indexes.pop(workspace_id).entries
+
+    # Incremental updates from this worker's writes; workspaces not loaded are skipped
+    def tracks(self, workspace_id: str) -> bool:
+        return workspace_id in self._indexes or workspace_id in self._pending
+
+    def add(self, workspace_id: str, document_id: str, file_name: str, values: tuple = ()) -> None:
+        self._apply(workspace_id, "add", (document_id, file_name, values))
+
+    def remove(self, workspace_id: str, document_id: str) -> None:
+        self._apply(workspace_id, "remove", (document_id,))
+
+    def _apply(self, workspace_id: str, operation: str, args: tuple) -> None:
+        index = self._indexes.get(workspace_id)
+        if index is not None:
+            getattr(index, operation)(*args)
+        if workspace_id in self._pending:
+            self._pending[workspace_id].append((operation, args))
+
+    def drop(self, workspace_id: str) -> None:
+        self._indexes.pop(workspace_id, None)
+
+
+search_index = SearchIndex()
@@ -0,0 +1,71 @@
+"""
+Cursor pagination and result counts for document search.
+
+Exact search pages through documents newest first, ordered by
+(created_at, id); a cursor is the key of the last result shown, so pages stay
+stable while documents are added. Fuzzy results are ranked in memory and page
+by offset instead.
+
+The first page also reports how many documents match. File name and content
+matches are counted separately, each stopping at SEARCH_COUNT_LIMIT, and the
+documents found by both are estimated from the content matches fetched for
+the page, so the total is exact only when every content match was fetched.
+"""
+
+import base64
+import json
+import os
+from typing import Optional, Tuple
+
+# Search Pagination Configuration
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_FUZZY_RESULTS = 1000  # Fuzzy pages stop at this rank
+SEARCH_COUNT_LIMIT = int(os.environ.get("SEARCH_COUNT_LIMIT", "10000"))  # Per source, larger totals are estimates
+
+
+class InvalidSearchCursor(ValueError):
+    pass
+
+
+def encode_cursor(**fields) -> str:
+    raw = json.dumps(fields, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fuzzy: bool = False) -> dict:
+    """{"t": created_at, "i": id} for exact search, {"o": offset} for fuzzy"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(data, dict):
+            raise ValueError(cursor)
+        if fuzzy:
+            if not isinstance(data.get("o"), int) or data["o"] < 0:
+                raise ValueError(cursor)
+        elif not isinstance(data.get("t"), str) or not isinstance(data.get("i"), str):
+            raise ValueError(cursor)
+        return data
+    except ValueError:
+        raise InvalidSearchCursor(cursor)
+
+
+def before(time_field: str, id_field: str, cursor: Optional[dict]) -> dict:
+    """Filter for the records after cursor in (time, id) descending order"""
+    if not cursor:
+        return {}
+    return {"$or": [
+        {time_field: {"$lt": cursor["t"]}},
+        {time_field: cursor["t"], id_field: {"$lt": cursor["i"]}},
+    ]}
+
+
+def estimate_total(name_count: int, content_count: int, sample_size: int, sample_overlap: int,
+                   content_complete: bool) -> Tuple[int, bool]:
+    """(total, estimated) for the union of file name and content matches.
+
+    sample_overlap of the sample_size content matches fetched also match by
+    file name; content_complete means that sample is every content match.
+    """
+    if content_complete and name_count < SEARCH_COUNT_LIMIT:
+        return name_count + content_count - sample_overlap, False
+    overlap = content_count * sample_overlap / sample_size if sample_size else 0
+    return name_count + round(content_count - overlap), True
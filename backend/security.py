@@ -19,12 +19,18 @@ if not JWT_SECRET_KEY or JWT_SECRET_KEY == "your-secret-key-change-in-production
 
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Reduced from 24 hours to 30 minutes
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.environ.get("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "10"))  # Concurrent tabs
 
 # Rate Limiting Configuration
 RATE_LIMIT_LOGIN = "5/minute"  # 5 login attempts per minute
 RATE_LIMIT_API = "100/minute"  # 100 API calls per minute
+RATE_LIMIT_REFRESH = "30/minute"  # Session renewals per minute
+RATE_LIMIT_THUMBNAILS = "1000/minute"  # Every row of a document list loads one
 
 # File Upload Configuration
+UPLOAD_DIR = ROOT_DIR / "uploads"
+UPLOAD_BASE_PATHS = ['/app/backend/uploads', '/uploads']  # Accepted prefixes for local file_path values
 MAX_METADATA_SIZE = 10240  # 10KB max for metadata JSON
 ALLOWED_FILE_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt', '.png', '.jpg', '.jpeg'}
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
@@ -43,6 +49,7 @@ SECURITY_HEADERS = {
 # Input Validation
 MAX_STRING_LENGTH = 500
 MAX_DESCRIPTION_LENGTH = 2000
+MAX_BATCH_IDS = 2000  # Ids per batch get request
 
 # Allowed external domains for document URLs
 ALLOWED_EXTERNAL_DOMAINS = [
@@ -102,30 +109,7 @@ def validate_file_path(file_path: str) -> bool:
             return False
     
     # Must start with allowed base path
-    allowed_base_paths = ['/app/backend/uploads', '/uploads']
-    if not any(file_path.startswith(base) for base in allowed_base_paths):
+    if not any(file_path.startswith(base) for base in UPLOAD_BASE_PATHS):
         return False
     
     return True
-
-def sanitize_metadata(metadata: dict) -> dict:
-    """Sanitize metadata dictionary"""
-    if not metadata or not isinstance(metadata, dict):
-        return {}
-    
-    sanitized = {}
-    for key, value in metadata.items():
-        # Sanitize key
-        safe_key = sanitize_string(str(key), 100)
-        
-        # Sanitize value
-        if isinstance(value, str):
-            safe_value = sanitize_string(value, MAX_DESCRIPTION_LENGTH)
-        elif isinstance(value, (int, float, bool)):
-            safe_value = value
-        else:
-            safe_value = sanitize_string(str(value), MAX_DESCRIPTION_LENGTH)
-        
-        sanitized[safe_key] = safe_value
-    
-    return sanitized
@@ -0,0 +1,329 @@
+"""
+Synthetic dataset generator for capacity testing.
+
+Builds users, teams, metadata definitions, workspaces and documents with the
+same shape the API writes, plus placeholder files in UPLOAD_DIR. Generation is
+driven by a single seed so two runs with the same arguments produce the same
+ids and values.
+
+Usage:
+    python seed_dataset.py --users 5000 --teams 800 --workspaces 300 --documents 2000000
+    python seed_dataset.py --grow --documents 250000 --workspaces 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from auth import get_password_hash
+from ids import IdGenerator
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+UPLOAD_DIR = ROOT_DIR / "uploads"
+SEED_SUBDIR = "seed"
+SEED_PASSWORD = "seedpassword"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("seed_dataset")
+
+# Metadata catalog modelled on the definitions used in production workspaces
+METADATA_CATALOG = [
+    ("Número Historia", "text", None),
+    ("Fecha Documento", "date", None),
+    ("Episodio", "number", None),
+    ("Servicio", "select", ["Cardiología", "Urgencias", "Radiología", "Pediatría", "Traumatología", "Medicina Interna"]),
+    ("Tipo Documento", "select", ["Informe", "Alta", "Consentimiento", "Analítica", "Ecocardiograma", "Interconsulta"]),
+    ("Facultativo", "text", None),
+    ("Cama", "number", None),
+    ("Fecha Ingreso", "date", None),
+    ("Prioridad", "select", ["Normal", "Preferente", "Urgente"]),
+    ("Observaciones", "text", None),
+]
+
+FILE_NAME_PREFIXES = [
+    "Informe", "Alta", "Consentimiento", "Analítica", "Ecocardiograma",
+    "Interconsulta", "Radiografía", "Resonancia", "Electrocardiograma", "Receta",
+]
+
+# Minimal single-page PDF; padding is appended after %%EOF, which readers ignore
+PLACEHOLDER_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n"
+    b"%%EOF\n"
+)
+
+
+def seeded_uuid(rng: random.Random) -> str:
+    """Generate a uuid4-formatted public_url from the seeded generator"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def iso(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+class FileSizeDistribution:
+    """Placeholder file size sampler (bytes)"""
+
+    def __init__(self, kind: str, median: int, maximum: int):
+        self.kind = kind
+        self.median = max(len(PLACEHOLDER_PDF), median)
+        self.maximum = max(self.median, maximum)
+
+    def sample(self, rng: random.Random) -> int:
+        if self.kind == "fixed":
+            size = self.median
+        elif self.kind == "uniform":
+            size = rng.randint(len(PLACEHOLDER_PDF), 2 * self.median)
+        else:
+            # Log-normal: most files near the median, a long tail of large scans
+            size = int(rng.lognormvariate(math.log(self.median), 1.0))
+        return max(len(PLACEHOLDER_PDF), min(size, self.maximum))
+
+
+def write_placeholder_file(path: Path, size: int) -> None:
+    """Write a valid PDF padded to the requested size"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    padding = size - len(PLACEHOLDER_PDF)
+    with open(path, "wb") as f:
+        f.write(PLACEHOLDER_PDF)
+        chunk = b"%" + b"0" * 1022 + b"\n"
+        while padding > 0:
+            piece = chunk[:padding]
+            f.write(piece)
+            padding -= len(piece)
+
+
+def metadata_value(rng: random.Random, definition: dict, now: datetime):
+    """Generate a value matching the MetadataDefinition field type"""
+    field_type = definition["field_type"]
+    if field_type == "number":
+        return rng.randint(1, 999999)
+    if field_type == "date":
+        return (now - timedelta(days=rng.randint(0, 3650))).strftime("%Y-%m-%d")
+    if field_type == "select" and definition.get("options"):
+        return rng.choice(definition["options"])
+    return f"{definition['name'][:3].upper()}-{rng.randint(100000, 999999)}"
+
+
+class BulkWriter:
+    """Runs insert_many batches concurrently with a bounded number in flight"""
+
+    def __init__(self, collection, batch_size: int, concurrency: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending = set()
+        self.buffer = []
+        self.inserted = 0
+
+    async def add(self, record: dict) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            await self._flush_buffer()
+
+    async def _insert(self, batch: list) -> None:
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            self.inserted += len(batch)
+        finally:
+            self.semaphore.release()
+
+    async def _flush_buffer(self) -> None:
+        batch, self.buffer = self.buffer, []
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._insert(batch))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def close(self) -> int:
+        if self.buffer:
+            await self._flush_buffer()
+        if self.pending:
+            await asyncio.gather(*self.pending)
+        return self.inserted
+
+
+async def load_existing(db) -> dict:
+    """Load the ids needed to grow an existing dataset"""
+    return {
+        "users": await db.users.find({}, {"_id": 0, "id": 1}).to_list(None),
+        "teams": await db.teams.find({}, {"_id": 0, "id": 1}).to_list(None),
+        "metadata": await db.metadata_definitions.find({}, {"_id": 0}).to_list(None),
+        "workspaces": await db.workspaces.find({}, {"_id": 0, "id": 1, "metadata_ids": 1}).to_list(None),
+        "documents": await db.documents.estimated_document_count(),
+    }
+
+
+async def seed(args) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    now = datetime.now(timezone.utc)
+
+    existing = await load_existing(db) if args.grow else {
+        "users": [], "teams": [], "metadata": [], "workspaces": [], "documents": 0
+    }
+
+    # Derive the stream from the existing size so growth steps are reproducible too
+    rng = random.Random(f"{args.seed}:{len(existing['users'])}:{len(existing['workspaces'])}:{existing['documents']}")
+    seeded_id = IdGenerator(rng)
+    password_hash = get_password_hash(SEED_PASSWORD)
+
+    # Metadata definitions (only created on a fresh dataset)
+    metadata = list(existing["metadata"])
+    if not metadata:
+        for name, field_type, options in METADATA_CATALOG:
+            metadata.append({
+                "id": seeded_id(now),
+                "name": name,
+                "field_type": field_type,
+                "visible": rng.random() < 0.7,
+                "options": options,
+                "created_at": iso(now),
+            })
+        await db.metadata_definitions.insert_many([dict(m) for m in metadata])
+        logger.info("Inserted %d metadata definitions", len(metadata))
+    metadata_by_id = {m["id"]: m for m in metadata}
+
+    # Teams
+    new_teams = [{
+        "id": seeded_id(now),
+        "name": f"Equipo {len(existing['teams']) + i + 1}",
+        "description": None,
+        "user_ids": [],
+        "created_at": iso(now),
+    } for i in range(args.teams)]
+    team_ids = [t["id"] for t in existing["teams"]] + [t["id"] for t in new_teams]
+
+    # Users, each in 1-3 teams; team membership is mirrored on teams.user_ids
+    members = {}
+    users = BulkWriter(db.users, args.batch_size, args.concurrency)
+    for i in range(args.users):
+        user_id = seeded_id(now)
+        user_teams = rng.sample(team_ids, k=min(len(team_ids), rng.randint(1, 3))) if team_ids else []
+        for team_id in user_teams:
+            members.setdefault(team_id, []).append(user_id)
+        await users.add({
+            "id": user_id,
+            "email": f"user{len(existing['users']) + i + 1}@seed.local",
+            "password_hash": password_hash,
+            "role": "admin" if rng.random() < 0.01 else "user",
+            "first_login": False,
+            "team_ids": user_teams,
+            "created_at": iso(now),
+        })
+    logger.info("Inserted %d users", await users.close())
+
+    for team in new_teams:
+        team["user_ids"] = members.pop(team["id"], [])
+    if new_teams:
+        await db.teams.insert_many(new_teams, ordered=False)
+    for team_id, user_ids in members.items():
+        await db.teams.update_one({"id": team_id}, {"$addToSet": {"user_ids": {"$each": user_ids}}})
+    logger.info("Inserted %d teams", len(new_teams))
+
+    # Workspaces with 1-3 teams and 2-6 metadata fields
+    new_workspaces = []
+    for i in range(args.workspaces):
+        new_workspaces.append({
+            "id": seeded_id(now),
+            "name": f"Espacio {len(existing['workspaces']) + i + 1}",
+            "description": None,
+            "metadata_ids": rng.sample(list(metadata_by_id), k=min(len(metadata_by_id), rng.randint(2, 6))),
+            "team_ids": rng.sample(team_ids, k=min(len(team_ids), rng.randint(1, 3))) if team_ids else [],
+            "created_at": iso(now),
+        })
+    if new_workspaces:
+        await db.workspaces.insert_many([dict(w) for w in new_workspaces], ordered=False)
+    logger.info("Inserted %d workspaces", len(new_workspaces))
+
+    workspaces = existing["workspaces"] + new_workspaces
+    if args.documents and not workspaces:
+        logger.error("No workspaces available to hold documents")
+        client.close()
+        return
+
+    # Skewed workspace sizes: a few very large workspaces, a long tail of small ones
+    cum_weights = list(itertools.accumulate(rng.paretovariate(1.2) for _ in workspaces))
+
+    # Placeholder file pool shared by the generated documents
+    sizes = FileSizeDistribution(args.file_size_dist, args.file_size_median, args.file_size_max)
+    seed_dir = UPLOAD_DIR / SEED_SUBDIR
+    pool_size = args.documents if args.file_pool == 0 else min(args.file_pool, args.documents)
+    pool_offset = existing["documents"]
+    file_pool = []
+    for i in range(pool_size):
+        path = seed_dir / f"{(pool_offset + i) % 256:02x}" / f"placeholder_{pool_offset + i}.pdf"
+        # Drawn even when the file is left over from an earlier run, so the
+        # random stream (and every id and value after it) doesn't depend on the disk
+        size = sizes.sample(rng)
+        if not path.exists():
+            write_placeholder_file(path, size)
+        file_pool.append(str(path))
+    logger.info("Prepared %d placeholder files in %s", len(file_pool), seed_dir)
+
+    documents = BulkWriter(db.documents, args.batch_size, args.concurrency)
+    span = timedelta(days=args.days)
+    step = span / max(args.documents, 1)
+    start = now - span
+    for i in range(args.documents):
+        workspace = rng.choices(workspaces, cum_weights=cum_weights)[0]
+        created = start + step * i
+        doc_metadata = {}
+        for meta_id in workspace.get("metadata_ids", []):
+            definition = metadata_by_id.get(meta_id)
+            if definition:
+                doc_metadata[definition["name"]] = metadata_value(rng, definition, now)
+        await documents.add({
+            "id": seeded_id(created),
+            "workspace_id": workspace["id"],
+            "file_path": file_pool[i % len(file_pool)],
+            "file_name": f"{rng.choice(FILE_NAME_PREFIXES)} {rng.randint(100000, 999999)}.pdf",
+            "public_url": seeded_uuid(rng),
+            "metadata": doc_metadata,
+            "created_at": iso(created),
+            "updated_at": iso(created),
+        })
+        if (i + 1) % 100000 == 0:
+            logger.info("Generated %d/%d documents", i + 1, args.documents)
+    logger.info("Inserted %d documents", await documents.close())
+
+    client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset for capacity testing")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for deterministic generation")
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--teams", type=int, default=0)
+    parser.add_argument("--workspaces", type=int, default=0)
+    parser.add_argument("--documents", type=int, default=0)
+    parser.add_argument("--days", type=int, default=365 * 5, help="Spread document creation dates over this many days")
+    parser.add_argument("--grow", action="store_true", help="Add records on top of the existing dataset")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many batches in flight")
+    parser.add_argument("--file-pool", type=int, default=1000,
+                        help="Number of placeholder files shared by documents (0 = one per document)")
+    parser.add_argument("--file-size-dist", choices=["lognormal", "uniform", "fixed"], default="lognormal")
+    parser.add_argument("--file-size-median", type=int, default=200 * 1024, help="Bytes")
+    parser.add_argument("--file-size-max", type=int, default=20 * 1024 * 1024, help="Bytes")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(seed(parse_args()))
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Header, Request
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Request
+from fastapi.responses import FileResponse, Response, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -9,31 +9,74 @@ from dotenv import load_dotenv
 import os
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone
 import shutil
 import secrets
 import hashlib
+import asyncio
+import json
+import heapq
+import re
 
 from models import (
-    User, UserCreate, UserUpdate, LoginRequest, ChangePasswordRequest, TokenResponse,
+    User, UserCreate, UserUpdate, LoginRequest, ChangePasswordRequest, TokenResponse, RefreshTokenRequest,
     Team, TeamCreate, TeamUpdate,
     MetadataDefinition, MetadataDefinitionCreate, MetadataDefinitionUpdate,
     Workspace, WorkspaceCreate, WorkspaceUpdate,
-    Document, DocumentCreate, DocumentUpdate, UserRole,
+    Document, DocumentCreate, DocumentUpdate, DocumentSearchResult, UserRole,
+    DocumentPartial, DocumentSearchResultPartial, DocumentChanges, DocumentBatchGet, DocumentBatch,
+    WorkspaceBootstrap, DocumentSuggestion, SearchCacheStats, AdmissionClassStats,
     ApiToken, ApiTokenCreate, ApiTokenUpdate, ApiTokenPermission,
-    ApiTokenResponse, ApiTokenCreateResponse
+    ApiTokenResponse, ApiTokenCreateResponse,
+    Job, JobStatus
 )
 from auth import verify_password, get_password_hash, create_access_token, decode_access_token
 from security import (
-    SECURITY_HEADERS, RATE_LIMIT_LOGIN, RATE_LIMIT_API,
-    sanitize_string, sanitize_metadata, validate_file_path,
-    MAX_METADATA_SIZE
+    SECURITY_HEADERS, RATE_LIMIT_LOGIN, RATE_LIMIT_API, RATE_LIMIT_REFRESH, RATE_LIMIT_THUMBNAILS,
+    sanitize_string, validate_file_path,
+    MAX_METADATA_SIZE, MAX_BATCH_IDS, UPLOAD_DIR
 )
 from audit import (
     log_auth_attempt, log_document_access, log_admin_action, log_security_event
 )
+from public_links import public_links, PublicLink, PUBLIC_CACHE_CONTROL
+from extraction import (
+    content_indexer, ensure_content_indexes, content_query, build_snippet, decompress_text,
+    MIN_TERM_LENGTH
+)
+from jobs import JobWorker, enqueue_job, ensure_job_indexes, JOB_INLINE_WORKER
+from file_gc import remove_unreferenced_files
+from storage import storage, local_upload_path, StoragePathError
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware, admission, ADMISSION_METRICS_PATH
+from notifications import change_hub
+from changes import (
+    fetch_changes, record_tombstone, ensure_change_indexes, InvalidSyncToken, SyncTokenExpired
+)
+from membership import (
+    ensure_membership_indexes, run_in_transaction, add_user_to_teams, set_team_members,
+    set_user_teams, remove_team_references, remove_user_references
+)
+from metadata_schema import metadata_schemas, MetadataValidationError
+from refresh_tokens import (
+    ensure_refresh_token_indexes, issue_refresh_token, rotate_refresh_token, revoke_refresh_token,
+    revoke_user_refresh_tokens, InvalidRefreshToken, RefreshTokenReused
+)
+from textutils import tokenize
+from search_index import search_index, select_values, MIN_PREFIX_LENGTH
+from fuzzy import FUZZY_MAX_INDEX_LOADS
+from ids import new_id
+from read_routing import ReadRouter
+from search_cache import search_cache, normalize_query, scope_key
+from search_pages import (
+    SEARCH_MAX_PAGE_SIZE, SEARCH_MAX_FUZZY_RESULTS, SEARCH_COUNT_LIMIT, InvalidSearchCursor,
+    encode_cursor, decode_cursor, before, estimate_total
+)
+from thumbnails import (
+    thumbnail_renderer, thumbnail_path, THUMBNAIL_CACHE_CONTROL, THUMBNAIL_MEDIA_TYPES
+)
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
@@ -43,6 +86,8 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
+# Document listing and search may be served by secondaries (READ_PREFERENCE)
+read_router = ReadRouter(client, db)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -54,7 +99,6 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
-UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -68,71 +112,67 @@ async def add_security_headers(request: Request, call_next):
         response.headers[header] = value
     return response
 
-# Auth dependency
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    token = credentials.credentials
-    
-    # Check if it's an API token first
-    if token.startswith(API_TOKEN_PREFIX):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="API tokens cannot access this endpoint. Use user credentials."
-        )
-    
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not user_doc:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    
-    if isinstance(user_doc.get('created_at'), str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    
-    return User(**user_doc)
+# API Token Authentication
+API_TOKEN_PREFIX = "costa_"
+API_TOKEN_LAST_USED_RESOLUTION = 60  # Seconds; last_used is written at most once per interval
+
+def generate_api_token() -> str:
+    """Generate a secure API token with prefix"""
+    return f"{API_TOKEN_PREFIX}{secrets.token_urlsafe(32)}"
+
+def hash_api_token(token: str) -> str:
+    """Hash API token for storage"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Permission bitmask: one bit per ApiTokenPermission, users hold every bit
+PERMISSION_BITS = {permission.value: 1 << i for i, permission in enumerate(ApiTokenPermission)}
+ALL_PERMISSIONS = (1 << len(PERMISSION_BITS)) - 1
+
+def permission_mask(permissions) -> int:
+    mask = 0
+    for permission in permissions or ():
+        mask |= PERMISSION_BITS.get(permission, 0)
+    return mask
 
 class AuthResult:
-    """Result of authentication - either a User or an API Token"""
+    """Principal of a request - either a User or an API Token - with precomputed checks"""
+    __slots__ = ("user", "api_token", "is_api_token", "is_admin", "permissions", "team_ids")
+    
     def __init__(self, user: Optional[User] = None, api_token: Optional[dict] = None):
         self.user = user
         self.api_token = api_token
         self.is_api_token = api_token is not None
+        self.is_admin = user is not None and user.role == UserRole.ADMIN
+        self.permissions = ALL_PERMISSIONS if user else permission_mask(api_token.get("permissions") if api_token else None)
+        self.team_ids = frozenset(user.team_ids) if user else frozenset()
     
     def has_permission(self, permission: str) -> bool:
-        if self.user:
-            return True  # Users have all permissions
-        if self.api_token:
-            return permission in self.api_token.get("permissions", [])
-        return False
-
-async def get_current_user_or_api_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> AuthResult:
-    """Authenticate via JWT token or API token"""
-    token = credentials.credentials
-    
-    # Check if it's an API token
-    if token.startswith(API_TOKEN_PREFIX):
-        token_hash = hash_api_token(token)
-        api_token = await db.api_tokens.find_one({"token_hash": token_hash}, {"_id": 0, "token_hash": 0})
-        
-        if not api_token:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API token")
-        
-        # Update last_used
-        await db.api_tokens.update_one(
-            {"id": api_token["id"]},
-            {"$set": {"last_used": datetime.now(timezone.utc).isoformat()}}
-        )
-        
-        return AuthResult(api_token=api_token)
+        return bool(self.permissions & PERMISSION_BITS.get(permission, 0))
+    
+    @property
+    def principal_id(self) -> str:
+        """User id, or api_token:<id> for API tokens"""
+        return self.user.id if self.user else f"api_token:{self.api_token['id']}"
+    
+    def can_access_workspace(self, workspace: dict) -> bool:
+        """API tokens and admins reach every workspace, users need team membership"""
+        if self.is_api_token or self.is_admin:
+            return True
+        return not self.team_ids.isdisjoint(workspace.get("team_ids") or ())
+
+async def _resolve_api_token(token: str) -> AuthResult:
+    api_token = await db.api_tokens.find_one({"token_hash": hash_api_token(token)}, {"_id": 0, "token_hash": 0})
+    if not api_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API token")
+    
+    now = datetime.now(timezone.utc)
+    last_used = api_token.get("last_used")
+    if not last_used or (now - datetime.fromisoformat(last_used)).total_seconds() >= API_TOKEN_LAST_USED_RESOLUTION:
+        await db.api_tokens.update_one({"id": api_token["id"]}, {"$set": {"last_used": now.isoformat()}})
     
-    # Otherwise, validate as JWT token
+    return AuthResult(api_token=api_token)
+
+async def _resolve_user(token: str) -> AuthResult:
     payload = decode_access_token(token)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -141,7 +181,7 @@ async def get_current_user_or_api_token(
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
     if not user_doc:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     
@@ -150,100 +190,59 @@ async def get_current_user_or_api_token(
     
     return AuthResult(user=User(**user_doc))
 
-async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    return current_user
-
-# API Token Authentication
-API_TOKEN_PREFIX = "costa_"
+# Auth dependencies
+async def authenticate(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthResult:
+    """Authenticate via JWT token or API token, once per request.
+    
+    The principal is kept on request.state.auth, so every dependency and
+    middleware of the request shares one token check and one database lookup.
+    """
+    auth = getattr(request.state, "auth", None)
+    if auth is None:
+        token = credentials.credentials
+        if token.startswith(API_TOKEN_PREFIX):
+            auth = await _resolve_api_token(token)
+        else:
+            auth = await _resolve_user(token)
+        request.state.auth = auth
+    return auth
 
-def generate_api_token() -> str:
-    """Generate a secure API token with prefix"""
-    return f"{API_TOKEN_PREFIX}{secrets.token_urlsafe(32)}"
+async def get_current_user(auth: AuthResult = Depends(authenticate)) -> User:
+    if auth.is_api_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="API tokens cannot access this endpoint. Use user credentials."
+        )
+    return auth.user
 
-def hash_api_token(token: str) -> str:
-    """Hash API token for storage"""
-    return hashlib.sha256(token.encode()).hexdigest()
+async def get_admin_user(auth: AuthResult = Depends(authenticate)) -> User:
+    user = await get_current_user(auth)
+    if not auth.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
 
-async def get_api_token_from_header(authorization: str = Header(None)) -> Optional[dict]:
-    """Extract and validate API token from header"""
-    if not authorization:
-        return None
-    
-    # Check for Bearer token format
-    if authorization.startswith("Bearer "):
-        token = authorization[7:]
-        
-        # Check if it's an API token (starts with prefix)
-        if token.startswith(API_TOKEN_PREFIX):
-            token_hash = hash_api_token(token)
-            api_token = await db.api_tokens.find_one({"token_hash": token_hash}, {"_id": 0})
-            
-            if api_token:
-                # Update last_used
-                await db.api_tokens.update_one(
-                    {"token_hash": token_hash},
-                    {"$set": {"last_used": datetime.now(timezone.utc).isoformat()}}
-                )
-                return api_token
-    
-    return None
+_permission_dependencies = {}
 
 def require_api_permission(permission: ApiTokenPermission):
-    """Dependency to check API token permissions"""
-    async def check_permission(
-        request: Request,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
-    ):
-        token = credentials.credentials
-        
-        # Check if it's an API token
-        if token.startswith(API_TOKEN_PREFIX):
-            token_hash = hash_api_token(token)
-            api_token = await db.api_tokens.find_one({"token_hash": token_hash}, {"_id": 0})
-            
-            if not api_token:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API token")
-            
-            # Check permission
-            if permission.value not in api_token.get("permissions", []):
+    """Dependency returning the principal; API tokens must hold permission.
+    One dependency per permission, so FastAPI shares it within a request."""
+    if permission not in _permission_dependencies:
+        async def check_permission(auth: AuthResult = Depends(authenticate)) -> AuthResult:
+            if not auth.has_permission(permission.value):
                 raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN, 
-                    detail=f"API token lacks required permission: {permission.value}"
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"API token lacks {permission.value} permission"
                 )
-            
-            # Update last_used
-            await db.api_tokens.update_one(
-                {"token_hash": token_hash},
-                {"$set": {"last_used": datetime.now(timezone.utc).isoformat()}}
-            )
-            
-            return {"type": "api_token", "token_data": api_token}
-        
-        # Otherwise, validate as regular JWT token
-        payload = decode_access_token(token)
-        if payload is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if not user_doc:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        
-        return {"type": "user", "user": User(**user_doc)}
-    
-    return check_permission
+            return auth
+        _permission_dependencies[permission] = check_permission
+    return _permission_dependencies[permission]
 
 # Initialize default admin user
 async def init_default_admin():
     existing_admin = await db.users.find_one({"email": "admin"})
     if not existing_admin:
         admin_user = {
-            "id": str(uuid.uuid4()),
+            "id": new_id(),
             "email": "admin",
             "password_hash": get_password_hash("admin"),
             "role": "admin",
@@ -254,12 +253,39 @@ async def init_default_admin():
         await db.users.insert_one(admin_user)
         logger.info("Default admin user created")
 
+async def ensure_indexes():
+    await db.documents.create_index("id", unique=True)
+    await db.documents.create_index([("workspace_id", 1), ("created_at", -1), ("id", -1)])
+    await db.documents.create_index("public_url")
+    await db.documents.create_index("created_at")
+    await db.documents.create_index("file_path")
+    await db.documents.create_index("thumbnail_key", sparse=True)
+    await ensure_content_indexes(db)
+    await ensure_job_indexes(db)
+    await ensure_membership_indexes(db)
+    await ensure_change_indexes(db)
+    await ensure_refresh_token_indexes(db)
+
+inline_job_worker = JobWorker(db) if JOB_INLINE_WORKER else None
+
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
     await init_default_admin()
+    public_links.schedule_rebuild(db)
+    content_indexer.start(db, on_stored=search_cache.bump)
+    change_hub.add_listener(search_cache.bump)
+    await change_hub.start(client, db)
+    if inline_job_worker:
+        inline_job_worker.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if inline_job_worker:
+        await inline_job_worker.stop()
+    thumbnail_renderer.shutdown()
+    await content_indexer.stop()
+    await change_hub.stop()
     client.close()
 
 # AUTH ENDPOINTS
@@ -283,10 +309,45 @@ async def login(request: Request, login_request: LoginRequest):
     
     user = User(**user_doc)
     access_token = create_access_token(data={"sub": user.id})
+    refresh_token = await issue_refresh_token(db, user.id)
     
     log_auth_attempt(email, True, client_ip)
     
-    return TokenResponse(access_token=access_token, token_type="bearer", user=user)
+    return TokenResponse(access_token=access_token, token_type="bearer", user=user, refresh_token=refresh_token)
+
+@api_router.post("/auth/refresh", response_model=TokenResponse)
+@limiter.limit(RATE_LIMIT_REFRESH)
+async def refresh_session(request: Request, refresh_request: RefreshTokenRequest):
+    """New access token for a refresh token; no password check, one indexed lookup"""
+    client_ip = get_remote_address(request)
+    try:
+        user_id, refresh_token = await rotate_refresh_token(db, refresh_request.refresh_token)
+    except RefreshTokenReused as e:
+        log_security_event(
+            "REFRESH_TOKEN_REUSE",
+            f"Rotated refresh token reused for user {e.user_id}; session {e.family_id} revoked",
+            client_ip
+        )
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    except InvalidRefreshToken:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+    if not user_doc:
+        await revoke_user_refresh_tokens(db, user_id)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    
+    if isinstance(user_doc.get('created_at'), str):
+        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    
+    user = User(**user_doc)
+    access_token = create_access_token(data={"sub": user.id})
+    return TokenResponse(access_token=access_token, token_type="bearer", user=user, refresh_token=refresh_token)
+
+@api_router.post("/auth/logout")
+async def logout(refresh_request: RefreshTokenRequest):
+    await revoke_refresh_token(db, refresh_request.refresh_token)
+    return {"message": "Logged out successfully"}
 
 @api_router.post("/auth/change-password")
 async def change_password(request: ChangePasswordRequest, current_user: User = Depends(get_current_user)):
@@ -299,8 +360,11 @@ async def change_password(request: ChangePasswordRequest, current_user: User = D
         {"id": current_user.id},
         {"$set": {"password_hash": new_hash, "first_login": False}}
     )
+    # Sessions opened with the old password end; this one continues with a new refresh token
+    await revoke_user_refresh_tokens(db, current_user.id)
+    refresh_token = await issue_refresh_token(db, current_user.id)
     
-    return {"message": "Password changed successfully"}
+    return {"message": "Password changed successfully", "refresh_token": refresh_token}
 
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: User = Depends(get_current_user)):
@@ -336,7 +400,7 @@ async def create_user(request: Request, user_data: UserCreate, current_user: Use
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
     
     new_user = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "email": email,
         "password_hash": get_password_hash(user_data.password),
         "role": user_data.role.value,
@@ -345,7 +409,11 @@ async def create_user(request: Request, user_data: UserCreate, current_user: Use
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(new_user)
+    async def write(session):
+        await db.users.insert_one(new_user, session=session)
+        await add_user_to_teams(db, new_user["id"], new_user["team_ids"], session=session)
+    
+    await run_in_transaction(client, write)
     log_admin_action(current_user.id, "CREATE_USER", email, client_ip)
     
     new_user.pop('password_hash')
@@ -361,9 +429,15 @@ async def update_user(user_id: str, user_data: UserUpdate, current_user: User =
     if not update_dict:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
     
-    result = await db.users.update_one({"id": user_id}, {"$set": update_dict})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    async def write(session):
+        existing_user = await db.users.find_one({"id": user_id}, {"_id": 0, "team_ids": 1}, session=session)
+        if not existing_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        if "team_ids" in update_dict:
+            await set_user_teams(db, user_id, existing_user.get("team_ids", []), update_dict["team_ids"], session=session)
+        await db.users.update_one({"id": user_id}, {"$set": update_dict}, session=session)
+    
+    await run_in_transaction(client, write)
     
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
     if isinstance(updated_user.get('created_at'), str):
@@ -375,10 +449,14 @@ async def delete_user(user_id: str, current_user: User = Depends(get_admin_user)
     if user_id == current_user.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot delete yourself")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    async def write(session):
+        result = await db.users.delete_one({"id": user_id}, session=session)
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        await remove_user_references(db, user_id, session=session)
+        await revoke_user_refresh_tokens(db, user_id, session=session)
     
+    await run_in_transaction(client, write)
     return {"message": "User deleted successfully"}
 
 # TEAM ENDPOINTS
@@ -393,57 +471,37 @@ async def list_teams(current_user: User = Depends(get_current_user)):
 @api_router.post("/teams", response_model=Team)
 async def create_team(team_data: TeamCreate, current_user: User = Depends(get_admin_user)):
     new_team = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "name": team_data.name,
         "description": team_data.description,
         "user_ids": team_data.user_ids,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.teams.insert_one(new_team)
+    async def write(session):
+        await db.teams.insert_one(new_team, session=session)
+        await set_team_members(db, new_team["id"], [], new_team["user_ids"], session=session)
     
-    # Update users to add this team
-    if team_data.user_ids:
-        await db.users.update_many(
-            {"id": {"$in": team_data.user_ids}},
-            {"$addToSet": {"team_ids": new_team["id"]}}
-        )
+    await run_in_transaction(client, write)
     
     new_team['created_at'] = datetime.fromisoformat(new_team['created_at'])
     return Team(**new_team)
 
 @api_router.put("/teams/{team_id}", response_model=Team)
 async def update_team(team_id: str, team_data: TeamUpdate, current_user: User = Depends(get_admin_user)):
-    existing_team = await db.teams.find_one({"id": team_id})
-    if not existing_team:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
-    
     update_dict = {k: v for k, v in team_data.model_dump().items() if v is not None}
     if not update_dict:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
     
-    # Handle user_ids update
-    if "user_ids" in update_dict:
-        old_user_ids = set(existing_team.get("user_ids", []))
-        new_user_ids = set(update_dict["user_ids"])
-        
-        # Remove team from users who are no longer in the team
-        removed_users = old_user_ids - new_user_ids
-        if removed_users:
-            await db.users.update_many(
-                {"id": {"$in": list(removed_users)}},
-                {"$pull": {"team_ids": team_id}}
-            )
-        
-        # Add team to new users
-        added_users = new_user_ids - old_user_ids
-        if added_users:
-            await db.users.update_many(
-                {"id": {"$in": list(added_users)}},
-                {"$addToSet": {"team_ids": team_id}}
-            )
+    async def write(session):
+        existing_team = await db.teams.find_one({"id": team_id}, {"_id": 0, "user_ids": 1}, session=session)
+        if not existing_team:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
+        await db.teams.update_one({"id": team_id}, {"$set": update_dict}, session=session)
+        if "user_ids" in update_dict:
+            await set_team_members(db, team_id, existing_team.get("user_ids", []), update_dict["user_ids"], session=session)
     
-    await db.teams.update_one({"id": team_id}, {"$set": update_dict})
+    await run_in_transaction(client, write)
     
     updated_team = await db.teams.find_one({"id": team_id}, {"_id": 0})
     if isinstance(updated_team.get('created_at'), str):
@@ -452,25 +510,19 @@ async def update_team(team_id: str, team_data: TeamUpdate, current_user: User =
 
 @api_router.delete("/teams/{team_id}")
 async def delete_team(team_id: str, current_user: User = Depends(get_admin_user)):
-    result = await db.teams.delete_one({"id": team_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
+    async def write(session):
+        result = await db.teams.delete_one({"id": team_id}, session=session)
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
+        await remove_team_references(db, team_id, session=session)
     
-    # Remove team from users
-    await db.users.update_many({}, {"$pull": {"team_ids": team_id}})
-    
-    # Remove team from workspaces
-    await db.workspaces.update_many({}, {"$pull": {"team_ids": team_id}})
+    await run_in_transaction(client, write)
     
     return {"message": "Team deleted successfully"}
 
 # METADATA ENDPOINTS
 @api_router.get("/metadata", response_model=List[MetadataDefinition])
-async def list_metadata(auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("metadata:read"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks metadata:read permission")
-    
+async def list_metadata(auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.METADATA_READ))):
     metadata = await db.metadata_definitions.find({}, {"_id": 0}).to_list(1000)
     for meta in metadata:
         if isinstance(meta.get('created_at'), str):
@@ -480,7 +532,7 @@ async def list_metadata(auth: AuthResult = Depends(get_current_user_or_api_token
 @api_router.post("/metadata", response_model=MetadataDefinition)
 async def create_metadata(meta_data: MetadataDefinitionCreate, current_user: User = Depends(get_admin_user)):
     new_meta = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "name": meta_data.name,
         "field_type": meta_data.field_type,
         "visible": meta_data.visible,
@@ -502,6 +554,8 @@ async def update_metadata(meta_id: str, meta_data: MetadataDefinitionUpdate, cur
     if result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metadata not found")
     
+    metadata_schemas.invalidate()
+    
     updated_meta = await db.metadata_definitions.find_one({"id": meta_id}, {"_id": 0})
     if isinstance(updated_meta.get('created_at'), str):
         updated_meta['created_at'] = datetime.fromisoformat(updated_meta['created_at'])
@@ -515,18 +569,15 @@ async def delete_metadata(meta_id: str, current_user: User = Depends(get_admin_u
     
     # Remove metadata from workspaces
     await db.workspaces.update_many({}, {"$pull": {"metadata_ids": meta_id}})
+    metadata_schemas.invalidate()
     
     return {"message": "Metadata deleted successfully"}
 
 # WORKSPACE ENDPOINTS
 @api_router.get("/workspaces", response_model=List[Workspace])
-async def list_workspaces(auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("workspaces:read"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks workspaces:read permission")
-    
+async def list_workspaces(auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.WORKSPACES_READ))):
     # API tokens and admins see all workspaces
-    if auth.is_api_token or (auth.user and auth.user.role == UserRole.ADMIN):
+    if auth.is_api_token or auth.is_admin:
         workspaces = await db.workspaces.find({}, {"_id": 0}).to_list(1000)
     else:
         # Filter by user's teams
@@ -540,10 +591,58 @@ async def list_workspaces(auth: AuthResult = Depends(get_current_user_or_api_tok
             workspace['created_at'] = datetime.fromisoformat(workspace['created_at'])
     return workspaces
 
+async def get_accessible_workspace(workspace_id: str, auth: AuthResult) -> dict:
+    workspace = await db.workspaces.find_one({"id": workspace_id}, {"_id": 0})
+    if not workspace:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
+    if not auth.can_access_workspace(workspace):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    if isinstance(workspace.get('created_at'), str):
+        workspace['created_at'] = datetime.fromisoformat(workspace['created_at'])
+    return workspace
+
+@api_router.get("/workspaces/{workspace_id}", response_model=Workspace)
+async def get_workspace(workspace_id: str, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.WORKSPACES_READ))):
+    return await get_accessible_workspace(workspace_id, auth)
+
+BOOTSTRAP_PAGE_SIZE = 50  # Default page size of the workspace view
+
+@api_router.get("/workspaces/{workspace_id}/bootstrap", response_model=WorkspaceBootstrap)
+async def bootstrap_workspace(workspace_id: str, limit: int = BOOTSTRAP_PAGE_SIZE, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
+    """Everything the workspace screen needs first, in one request"""
+    for permission in (ApiTokenPermission.WORKSPACES_READ, ApiTokenPermission.METADATA_READ):
+        if not auth.has_permission(permission.value):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"API token lacks {permission.value} permission")
+    
+    workspace = await get_accessible_workspace(workspace_id, auth)
+    limit = max(1, min(limit, 1000))
+    
+    # Independent queries, sent together
+    metadata, documents, document_count = await asyncio.gather(
+        db.metadata_definitions.find({"id": {"$in": workspace.get("metadata_ids", [])}}, {"_id": 0}).to_list(1000),
+        db.documents.find({"workspace_id": workspace_id}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit),
+        db.documents.count_documents({"workspace_id": workspace_id}),
+    )
+    
+    for meta in metadata:
+        if isinstance(meta.get('created_at'), str):
+            meta['created_at'] = datetime.fromisoformat(meta['created_at'])
+    for doc in documents:
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        if isinstance(doc.get('updated_at'), str):
+            doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
+    
+    # Keep the workspace's own order of metadata fields
+    order = {meta_id: i for i, meta_id in enumerate(workspace.get("metadata_ids", []))}
+    metadata.sort(key=lambda meta: order.get(meta["id"], len(order)))
+    
+    return {"workspace": workspace, "metadata": metadata, "documents": documents, "document_count": document_count}
+
 @api_router.post("/workspaces", response_model=Workspace)
 async def create_workspace(workspace_data: WorkspaceCreate, current_user: User = Depends(get_admin_user)):
     new_workspace = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "name": workspace_data.name,
         "description": workspace_data.description,
         "metadata_ids": workspace_data.metadata_ids,
@@ -576,32 +675,66 @@ async def delete_workspace(workspace_id: str, current_user: User = Depends(get_a
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
     
-    # Delete all documents in this workspace
-    await db.documents.delete_many({"workspace_id": workspace_id})
+    # Documents in this workspace are deleted by a background job
+    job = await enqueue_job(db, "delete_workspace", {"workspace_id": workspace_id}, current_user.id)
+    public_links.invalidate()
+    metadata_schemas.invalidate(workspace_id)
+    search_index.drop(workspace_id)
+    search_cache.bump(workspace_id)
     
-    return {"message": "Workspace deleted successfully"}
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"message": "Workspace deleted, removing its documents", "job_id": job["id"]}
+    )
 
 # DOCUMENT ENDPOINTS
+DOCUMENT_FIELDS = set(Document.model_fields)
+SEARCH_RESULT_FIELDS = set(DocumentSearchResult.model_fields)
+SEARCH_MODES = ("exact", "fuzzy")
+
+def parse_fields(fields: Optional[str], allowed: set) -> Optional[set]:
+    """Comma separated ?fields= list; metadata.<key> selects a single metadata value"""
+    if fields is None:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    for field in requested:
+        if field in allowed:
+            continue
+        key = field[len("metadata."):] if field.startswith("metadata.") else ""
+        if not key or "$" in key or "." in key or len(key) > 100:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown field: {field}")
+    if "metadata" in requested:
+        # Whole metadata already includes every key; Mongo rejects the overlapping projection
+        requested = {field for field in requested if not field.startswith("metadata.")}
+    return requested | {"id"}
+
+def fields_projection(requested: set, stored: set = DOCUMENT_FIELDS) -> dict:
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in requested if field in stored or field.startswith("metadata.")})
+    return projection
+
+def partial_response(model, documents: list) -> JSONResponse:
+    """Serialize only the fields present on each record"""
+    return JSONResponse(content=[model(**doc).model_dump(mode="json", exclude_unset=True) for doc in documents])
+
 @api_router.get("/workspaces/{workspace_id}/documents", response_model=List[Document])
-async def list_documents(workspace_id: str, auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:read"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:read permission")
-    
+async def list_documents(workspace_id: str, fields: Optional[str] = None, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
     # Check access
     workspace = await db.workspaces.find_one({"id": workspace_id})
     if not workspace:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
     
     # API tokens have access to all workspaces, users need team membership
-    if auth.user and auth.user.role != UserRole.ADMIN:
-        if not any(team_id in auth.user.team_ids for team_id in workspace.get("team_ids", [])):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    if not auth.can_access_workspace(workspace):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
-    documents = await db.documents.find(
-        {"workspace_id": workspace_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
+    requested = parse_fields(fields, DOCUMENT_FIELDS)
+    async with read_router.read_session(auth.principal_id) as (read_db, session):
+        documents = await read_db.documents.find(
+            {"workspace_id": workspace_id},
+            fields_projection(requested) if requested else {"_id": 0},
+            session=session
+        ).sort("created_at", -1).to_list(1000)
     
     for doc in documents:
         if isinstance(doc.get('created_at'), str):
@@ -609,17 +742,78 @@ async def list_documents(workspace_id: str, auth: AuthResult = Depends(get_curre
         if isinstance(doc.get('updated_at'), str):
             doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
     
+    if requested:
+        return partial_response(DocumentPartial, documents)
     return documents
 
+@api_router.get("/workspaces/{workspace_id}/documents/changes", response_model=DocumentChanges)
+async def document_changes(workspace_id: str, since: Optional[str] = None, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
+    """Documents created or updated and ids deleted since a sync token; no token returns everything"""
+    # Check access
+    workspace = await db.workspaces.find_one({"id": workspace_id}, {"_id": 0, "team_ids": 1})
+    if not workspace:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
+    
+    if not auth.can_access_workspace(workspace):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    
+    try:
+        changes = await fetch_changes(db, workspace_id, since)
+    except InvalidSyncToken:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    except SyncTokenExpired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token expired, reload the document list")
+    
+    for doc in changes["documents"]:
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        if isinstance(doc.get('updated_at'), str):
+            doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
+    
+    return changes
+
+@api_router.get("/workspaces/{workspace_id}/documents/autocomplete", response_model=List[DocumentSuggestion])
+async def autocomplete_documents(workspace_id: str, q: str, limit: int = 10, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_SEARCH))):
+    """Newest documents whose file name has words starting with what was typed"""
+    if len(q.strip()) < MIN_PREFIX_LENGTH:
+        return []
+    await get_accessible_workspace(workspace_id, auth)
+    return await search_index.suggest(db, workspace_id, q, max(1, limit))
+
+@api_router.get("/workspaces/{workspace_id}/documents/events")
+async def document_events(request: Request, workspace_id: str, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
+    """Server-sent events naming documents as they change; fetch them with /documents/changes"""
+    # Check access
+    workspace = await db.workspaces.find_one({"id": workspace_id}, {"_id": 0, "team_ids": 1})
+    if not workspace:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workspace not found")
+    
+    if not auth.can_access_workspace(workspace):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    
+    return StreamingResponse(
+        change_hub.subscribe(workspace_id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def validate_metadata(workspace: dict, metadata: dict) -> dict:
+    """Coerce metadata to the workspace's field types and check its size"""
+    schema = await metadata_schemas.get(db, workspace)
+    try:
+        metadata = schema.validate(metadata)
+    except MetadataValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid metadata: {e}")
+    
+    if len(json.dumps(metadata)) > MAX_METADATA_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Metadata too large")
+    return metadata
+
 @api_router.post("/workspaces/{workspace_id}/documents", response_model=Document)
 @limiter.limit(RATE_LIMIT_API)
-async def create_document(request: Request, workspace_id: str, doc_data: DocumentCreate, auth: AuthResult = Depends(get_current_user_or_api_token)):
+async def create_document(request: Request, workspace_id: str, doc_data: DocumentCreate, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_CREATE))):
     client_ip = get_remote_address(request)
     
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:create"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:create permission")
-    
     # Check workspace exists
     workspace = await db.workspaces.find_one({"id": workspace_id})
     if not workspace:
@@ -634,20 +828,13 @@ async def create_document(request: Request, workspace_id: str, doc_data: Documen
         log_security_event("INVALID_FILE_PATH", f"Attempted path traversal: {file_path}", client_ip)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file path")
     
-    # Sanitize and validate metadata
-    metadata = sanitize_metadata(doc_data.metadata)
-    
-    # Check metadata size
-    import json
-    metadata_size = len(json.dumps(metadata))
-    if metadata_size > MAX_METADATA_SIZE:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Metadata too large")
+    metadata = await validate_metadata(workspace, doc_data.metadata)
     
-    public_url = str(uuid.uuid4())
+    public_url = str(uuid.uuid4())  # Unguessable, so not time-ordered
     now = datetime.now(timezone.utc)
     
     new_doc = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(now),
         "workspace_id": workspace_id,
         "file_path": file_path,
         "file_name": file_name,
@@ -657,31 +844,59 @@ async def create_document(request: Request, workspace_id: str, doc_data: Documen
         "updated_at": now.isoformat()
     }
     
-    await db.documents.insert_one(new_doc)
-    creator_id = auth.user.id if auth.user else f"api_token:{auth.api_token['id']}"
-    log_document_access(creator_id, new_doc["id"], "CREATE", client_ip)
+    async with read_router.write_session(auth.principal_id) as session:
+        await db.documents.insert_one(new_doc, session=session)
+    public_links.add(public_url, new_doc["created_at"])
+    thumbnail_renderer.schedule(db, new_doc["id"], file_path)
+    content_indexer.submit(new_doc)
+    schema = await metadata_schemas.get(db, workspace)
+    search_index.add(workspace_id, new_doc["id"], file_name, select_values(metadata, schema.select_fields))
+    change_hub.notify(workspace_id, "insert", new_doc["id"])
+    log_document_access(auth.principal_id, new_doc["id"], "CREATE", client_ip)
     
     new_doc['created_at'] = now
     new_doc['updated_at'] = now
     return Document(**new_doc)
 
 @api_router.put("/documents/{doc_id}", response_model=Document)
-async def update_document(doc_id: str, doc_data: DocumentUpdate, auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:update"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:update permission")
-    
+async def update_document(doc_id: str, doc_data: DocumentUpdate, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_UPDATE))):
     update_dict = {k: v for k, v in doc_data.model_dump().items() if v is not None}
     if not update_dict:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
     
+    if "metadata" in update_dict:
+        current = await db.documents.find_one({"id": doc_id}, {"_id": 0, "workspace_id": 1})
+        if not current:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        workspace = await db.workspaces.find_one({"id": current["workspace_id"]}, {"_id": 0, "id": 1, "metadata_ids": 1})
+        update_dict["metadata"] = await validate_metadata(workspace or {"id": current["workspace_id"]}, update_dict["metadata"])
+    
     update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    result = await db.documents.update_one({"id": doc_id}, {"$set": update_dict})
+    update_ops = {"$set": update_dict}
+    if "file_path" in update_dict:
+        # Previous thumbnail belongs to the old file
+        update_ops["$unset"] = {"thumbnail_key": "", "thumbnail_failed": ""}
+    
+    async with read_router.write_session(auth.principal_id) as session:
+        result = await db.documents.update_one({"id": doc_id}, update_ops, session=session)
     if result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
     
     updated_doc = await db.documents.find_one({"id": doc_id}, {"_id": 0})
+    public_links.invalidate(updated_doc["public_url"])
+    if "file_path" in update_dict:
+        thumbnail_renderer.schedule(db, doc_id, updated_doc["file_path"])
+        await db.document_contents.delete_one({"document_id": doc_id})
+        content_indexer.submit(updated_doc)
+    if ("file_name" in update_dict or "metadata" in update_dict) and search_index.tracks(updated_doc["workspace_id"]):
+        workspace = await db.workspaces.find_one({"id": updated_doc["workspace_id"]}, {"_id": 0, "id": 1, "metadata_ids": 1})
+        schema = await metadata_schemas.get(db, workspace or {"id": updated_doc["workspace_id"]})
+        search_index.add(
+            updated_doc["workspace_id"], doc_id, updated_doc["file_name"],
+            select_values(updated_doc.get("metadata"), schema.select_fields)
+        )
+    change_hub.notify(updated_doc["workspace_id"], "update", doc_id)
     if isinstance(updated_doc.get('created_at'), str):
         updated_doc['created_at'] = datetime.fromisoformat(updated_doc['created_at'])
     if isinstance(updated_doc.get('updated_at'), str):
@@ -689,35 +904,229 @@ async def update_document(doc_id: str, doc_data: DocumentUpdate, auth: AuthResul
     return Document(**updated_doc)
 
 @api_router.delete("/documents/{doc_id}")
-async def delete_document(doc_id: str, auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:delete"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:delete permission")
-    
-    result = await db.documents.delete_one({"id": doc_id})
-    if result.deleted_count == 0:
+async def delete_document(doc_id: str, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_DELETE))):
+    async with read_router.write_session(auth.principal_id) as session:
+        deleted = await db.documents.find_one_and_delete(
+            {"id": doc_id}, {"_id": 0, "public_url": 1, "file_path": 1, "workspace_id": 1}, session=session
+        )
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    await record_tombstone(db, doc_id, deleted["workspace_id"])
+    search_index.remove(deleted["workspace_id"], doc_id)
+    change_hub.notify(deleted["workspace_id"], "delete", doc_id)
+    public_links.invalidate(deleted["public_url"])
+    await db.document_contents.delete_one({"document_id": doc_id})
+    
+    # Remove the uploaded file unless another document still points at it
+    await remove_unreferenced_files(db, [deleted["file_path"]])
     
     return {"message": "Document deleted successfully"}
 
-@api_router.get("/documents/search", response_model=List[Document])
+@api_router.post("/documents/batch", response_model=DocumentBatch)
+@limiter.limit(RATE_LIMIT_API)
+async def batch_get_documents(request: Request, batch: DocumentBatchGet, fields: Optional[str] = None, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
+    """Documents by id in one indexed $in query, with one access check per workspace"""
+    ids = list(dict.fromkeys(batch.ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    
+    requested = parse_fields(fields, DOCUMENT_FIELDS)
+    projection = fields_projection(requested | {"workspace_id"}) if requested else {"_id": 0}
+    async with read_router.read_session(auth.principal_id) as (read_db, session):
+        documents = await read_db.documents.find({"id": {"$in": ids}}, projection, session=session).to_list(len(ids))
+    
+    # API tokens and admins reach every workspace; users only need the workspaces involved
+    if not (auth.is_api_token or auth.is_admin):
+        workspace_ids = list({doc["workspace_id"] for doc in documents})
+        workspaces = await db.workspaces.find(
+            {"id": {"$in": workspace_ids}}, {"_id": 0, "id": 1, "team_ids": 1}
+        ).to_list(len(workspace_ids))
+        allowed = {ws["id"] for ws in workspaces if auth.can_access_workspace(ws)}
+        documents = [doc for doc in documents if doc["workspace_id"] in allowed]
+    
+    by_id = {doc["id"]: doc for doc in documents}
+    found = [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+    missing = [doc_id for doc_id in ids if doc_id not in by_id]
+    
+    for doc in found:
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        if isinstance(doc.get('updated_at'), str):
+            doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
+        if requested and "workspace_id" not in requested:
+            del doc["workspace_id"]
+    
+    if requested:
+        return JSONResponse(content={
+            "documents": [DocumentPartial(**doc).model_dump(mode="json", exclude_unset=True) for doc in found],
+            "missing": missing,
+        })
+    return {"documents": found, "missing": missing}
+
+def search_page_headers(response: Response, next_cursor: Optional[str], total: Optional[Tuple[int, bool]], skipped: int = 0) -> None:
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        count, estimated = total
+        response.headers["X-Total-Count"] = str(count)
+        response.headers["X-Total-Count-Estimated"] = "true" if estimated else "false"
+    if skipped:
+        # Fuzzy search left out workspaces whose index isn't loaded yet
+        response.headers["X-Search-Partial"] = "true"
+        response.headers["X-Search-Workspaces-Skipped"] = str(skipped)
+
+async def fuzzy_search(read_db, session, workspace_ids: List[str], search_query: str, projection: dict, offset: int, limit: int):
+    """Typo-tolerant search over file names and select metadata values, best match first.
+
+    Returns (documents, offset of the next page or None, workspaces skipped).
+    """
+    wanted = min(offset + limit + 1, SEARCH_MAX_FUZZY_RESULTS)
+    # Each workspace needs its index in memory; bound the index builds of one request
+    matches, skipped = await search_index.fuzzy(db, workspace_ids, search_query, wanted, FUZZY_MAX_INDEX_LOADS)
+    ranked = heapq.nlargest(wanted, matches, key=lambda match: match[1])
+    next_offset = offset + limit if len(ranked) > offset + limit else None
+    scores = dict(ranked[offset:offset + limit])
+    if not scores:
+        return [], None, skipped
+    
+    documents = await read_db.documents.find({"id": {"$in": list(scores)}}, projection, session=session).to_list(limit)
+    for doc in documents:
+        doc["score"] = scores[doc["id"]]
+    documents.sort(key=lambda doc: (doc["score"], doc["created_at"]), reverse=True)
+    return documents, next_offset, skipped
+
+async def exact_search(read_db, session, workspace_ids: List[str], search_query: str, projection: dict, want_snippets: bool,
+                       cursor: Optional[dict], limit: int):
+    """File name and content matches, newest first.
+
+    Returns (documents, cursor of the next page or None, total or None); the
+    total is only counted for the first page.
+    """
+    # Use safe regex pattern - escape special regex characters
+    safe_query = re.escape(search_query)
+    name_query = {
+        "workspace_id": {"$in": workspace_ids},
+        "file_name": {"$regex": safe_query, "$options": "i"}
+    }
+    
+    # Both sources are read in (created_at, id) order from the cursor on; one
+    # extra record from each tells whether another page exists
+    documents = await read_db.documents.find(
+        {**name_query, **before("created_at", "id", cursor)}, projection, session=session
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    contents = []
+    content_query_filter = None
+    query_tokens = tokenize(search_query, MIN_TERM_LENGTH)
+    if query_tokens:
+        content_query_filter = {"workspace_id": {"$in": workspace_ids}, **content_query(query_tokens)}
+        content_projection = {"_id": 0, "document_id": 1, "created_at": 1}
+        if want_snippets:
+            content_projection["text_z"] = 1
+        contents = await read_db.document_contents.find(
+            {"$and": [content_query_filter, before("created_at", "document_id", cursor)]}, content_projection, session=session
+        ).sort([("created_at", -1), ("document_id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    found = {doc["id"]: doc for doc in documents}
+    content_ids = [content["document_id"] for content in contents]
+    missing_ids = [doc_id for doc_id in content_ids if doc_id not in found]
+    if missing_ids:
+        for doc in await read_db.documents.find({"id": {"$in": missing_ids}}, projection, session=session).to_list(len(missing_ids)):
+            found[doc["id"]] = doc
+    
+    page_ids = sorted(found, key=lambda doc_id: (found[doc_id]["created_at"], doc_id), reverse=True)
+    next_cursor = None
+    if len(page_ids) > limit:
+        page_ids = page_ids[:limit]
+        next_cursor = encode_cursor(t=found[page_ids[-1]]["created_at"], i=page_ids[-1])
+    
+    snippets = {}
+    if want_snippets:
+        page = set(page_ids)
+        for content in contents:
+            if content["document_id"] in page:
+                snippets[content["document_id"]] = build_snippet(decompress_text(content), query_tokens)
+    
+    results = []
+    for doc_id in page_ids:
+        doc = found.get(doc_id)
+        # Content matches whose snippet no longer matches are dropped as before
+        if doc is None or snippets.get(doc_id, {}) is None:
+            continue
+        doc.update(snippets.get(doc_id) or {})
+        results.append(doc)
+    
+    total = None
+    if cursor is None:
+        counts = [read_db.documents.count_documents(name_query, limit=SEARCH_COUNT_LIMIT, session=session)]
+        if content_query_filter:
+            counts.append(read_db.document_contents.count_documents(content_query_filter, limit=SEARCH_COUNT_LIMIT, session=session))
+        if session is None:
+            counts = await asyncio.gather(*counts)
+        else:
+            # A session serves one operation at a time
+            counts = [await count for count in counts]
+        name_count, content_count = (counts + [0])[:2]
+        name_pattern = re.compile(safe_query, re.IGNORECASE)
+        overlap = sum(
+            1 for doc_id in content_ids
+            if doc_id in found and name_pattern.search(found[doc_id].get("file_name", ""))
+        )
+        total = estimate_total(name_count, content_count, len(content_ids), overlap, len(content_ids) <= limit)
+    return results, next_cursor, total
+
+async def run_search(read_db, session, mode: str, workspace_ids: List[str], search_query: str, projection: dict, want_snippets: bool,
+                     position: Optional[dict], limit: int, requested: Optional[set]):
+    """(documents ready to serialize, next cursor, total, workspaces skipped)"""
+    skipped = 0
+    if mode == "fuzzy":
+        documents, next_offset, skipped = await fuzzy_search(read_db, session, workspace_ids, search_query, projection, (position or {}).get("o", 0), limit)
+        next_cursor = encode_cursor(o=next_offset) if next_offset is not None else None
+        total = None
+    else:
+        documents, next_cursor, total = await exact_search(read_db, session, workspace_ids, search_query, projection, want_snippets, position, limit)
+    
+    for doc in documents:
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        if isinstance(doc.get('updated_at'), str):
+            doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
+        if requested:
+            for field in ("id", "created_at", "file_name", "snippet", "highlights", "score"):
+                if field not in requested:
+                    doc.pop(field, None)
+    return documents, next_cursor, total, skipped
+
+@api_router.get("/documents/search", response_model=List[DocumentSearchResult])
 @limiter.limit(RATE_LIMIT_API)
-async def search_documents(request: Request, q: str, auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:search"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:search permission")
+async def search_documents(request: Request, response: Response, q: str, fields: Optional[str] = None, mode: str = "exact",
+                           limit: int = SEARCH_MAX_PAGE_SIZE, cursor: Optional[str] = None,
+                           auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_SEARCH))):
+    """One page of results; X-Next-Cursor names the next one and the first page carries X-Total-Count"""
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid mode, expected one of: {', '.join(SEARCH_MODES)}")
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    try:
+        position = decode_cursor(cursor, fuzzy=mode == "fuzzy") if cursor else None
+    except InvalidSearchCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     
     # Sanitize search query to prevent NoSQL injection
-    search_query = sanitize_string(q, 200)
+    search_query = normalize_query(sanitize_string(q, 200))
     
     if not search_query or len(search_query) < 2:
         return []
     
+    requested = parse_fields(fields, SEARCH_RESULT_FIELDS)
+    # id, created_at and file_name order and count the results
+    projection = fields_projection(requested | {"id", "created_at", "file_name"}) if requested else {"_id": 0}
+    want_snippets = not requested or bool(requested & {"snippet", "highlights"})
+    
     # Get accessible workspaces
     if auth.is_api_token:
         # API tokens can search all workspaces
         workspaces = await db.workspaces.find({}, {"_id": 0, "id": 1}).to_list(1000)
-    elif auth.user.role == UserRole.ADMIN:
+    elif auth.is_admin:
         workspaces = await db.workspaces.find({}, {"_id": 0, "id": 1}).to_list(1000)
     else:
         workspaces = await db.workspaces.find(
@@ -727,61 +1136,61 @@ async def search_documents(request: Request, q: str, auth: AuthResult = Depends(
     
     workspace_ids = [ws["id"] for ws in workspaces]
     
-    # Use safe regex pattern - escape special regex characters
-    import re
-    safe_query = re.escape(search_query)
-    
-    # Search in file_name only (safer than searching in all fields)
-    documents = await db.documents.find(
-        {
-            "workspace_id": {"$in": workspace_ids},
-            "file_name": {"$regex": safe_query, "$options": "i"}
-        },
-        {"_id": 0}
-    ).sort("created_at", -1).limit(100).to_list(100)
-    
-    for doc in documents:
-        if isinstance(doc.get('created_at'), str):
-            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
-        if isinstance(doc.get('updated_at'), str):
-            doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
-    
+    cache_key = (mode, search_query.lower(), tuple(sorted(requested or ())), limit, cursor, scope_key(workspace_ids))
+    cache_stamp = search_cache.stamp(workspace_ids)
+    # After their own write a caller reads through a causal session, not entries others cached
+    cached = None if read_router.has_recent_write(auth.principal_id) else search_cache.get(cache_key, cache_stamp)
+    if cached is not None:
+        documents, next_cursor, total, skipped = cached
+    else:
+        async with read_router.read_session(auth.principal_id) as (read_db, session):
+            documents, next_cursor, total, skipped = await run_search(
+                read_db, session, mode, workspace_ids, search_query, projection, want_snippets, position, limit, requested
+            )
+        if not skipped:
+            # Partial pages would outlive the index builds that complete them
+            search_cache.put(cache_key, cache_stamp, (documents, next_cursor, total, skipped))
+    
+    if requested:
+        partial = partial_response(DocumentSearchResultPartial, documents)
+        search_page_headers(partial, next_cursor, total, skipped)
+        return partial
+    search_page_headers(response, next_cursor, total, skipped)
     return documents
 
 @api_router.get("/documents/{doc_id}/view")
 @limiter.limit(RATE_LIMIT_API)
-async def view_document(request: Request, doc_id: str, auth: AuthResult = Depends(get_current_user_or_api_token)):
-    # Check permission for API tokens
-    if auth.is_api_token and not auth.has_permission("documents:read"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API token lacks documents:read permission")
-    
+async def view_document(request: Request, doc_id: str, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
     client_ip = get_remote_address(request)
     
     doc = await db.documents.find_one({"id": doc_id}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
     
-    viewer_id = auth.user.id if auth.user else f"api_token:{auth.api_token['id']}"
-    log_document_access(viewer_id, doc_id, "VIEW", client_ip)
+    log_document_access(auth.principal_id, doc_id, "VIEW", client_ip)
     
     file_path_str = doc["file_path"]
     
     # Check if it's an external URL
     if file_path_str.startswith(('http://', 'https://')):
         # Return a redirect response for external URLs
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url=file_path_str)
     
-    # Local file handling
-    file_path = Path(file_path_str)
+    # Object storage: short-lived signed URL, the bucket serves the bytes
+    if storage.redirects:
+        try:
+            url = storage.presigned_url(file_path_str, doc["file_name"])
+        except StoragePathError:
+            log_security_event("PATH_TRAVERSAL_ATTEMPT", f"Attempted access to: {file_path_str}", client_ip)
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+        return RedirectResponse(url=url, headers={"Cache-Control": "no-store"})
     
-    # Additional security check for path traversal
+    # Local file handling, with a security check for path traversal
     try:
-        file_path = file_path.resolve()
-        UPLOAD_DIR.resolve()
-        if not str(file_path).startswith(str(UPLOAD_DIR.resolve())):
-            log_security_event("PATH_TRAVERSAL_ATTEMPT", f"Attempted access to: {file_path}", client_ip)
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+        file_path = storage.local_path(file_path_str)
+    except StoragePathError:
+        log_security_event("PATH_TRAVERSAL_ATTEMPT", f"Attempted access to: {file_path_str}", client_ip)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     except Exception as e:
         log_security_event("FILE_ACCESS_ERROR", f"Error accessing file: {str(e)}", client_ip)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file path")
@@ -789,28 +1198,149 @@ async def view_document(request: Request, doc_id: str, auth: AuthResult = Depend
     if not file_path.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     
+    # Let the front proxy send the bytes when offload is configured
+    offloaded = storage.offload_response(file_path, doc["file_name"])
+    if offloaded:
+        return offloaded
+    
     return FileResponse(file_path, media_type="application/pdf", filename=doc["file_name"])
 
-@api_router.get("/public/documents/{public_url}")
-async def view_public_document(public_url: str):
-    doc = await db.documents.find_one({"public_url": public_url}, {"_id": 0})
+@api_router.get("/documents/{doc_id}/thumbnail")
+@limiter.limit(RATE_LIMIT_THUMBNAILS)
+async def view_document_thumbnail(request: Request, doc_id: str, auth: AuthResult = Depends(require_api_permission(ApiTokenPermission.DOCUMENTS_READ))):
+    doc = await db.documents.find_one(
+        {"id": doc_id}, {"_id": 0, "file_path": 1, "thumbnail_key": 1, "thumbnail_failed": 1}
+    )
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
     
-    file_path_str = doc["file_path"]
+    if not thumbnail_renderer.can_render(doc["file_path"]) or doc.get("thumbnail_failed") == doc["file_path"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail not available")
+    
+    try:
+        source = local_upload_path(doc["file_path"])
+    except StoragePathError:
+        log_security_event("PATH_TRAVERSAL_ATTEMPT", f"Attempted access to: {doc['file_path']}", get_remote_address(request))
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thumbnail not available")
+    
+    key = doc.get("thumbnail_key")
+    if key:
+        thumb = thumbnail_path(source, key)
+        try:
+            thumb_stat = thumb.stat()
+            fresh = source.stat().st_mtime <= thumb_stat.st_mtime
+        except OSError:
+            fresh = False
+        
+        if fresh:
+            # Key is a content hash, so it doubles as a strong ETag
+            etag = f'"{key}"'
+            headers = {"Cache-Control": THUMBNAIL_CACHE_CONTROL, "ETag": etag}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            media_type = THUMBNAIL_MEDIA_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+            return FileResponse(thumb, media_type=media_type, stat_result=thumb_stat, headers=headers)
+    
+    # Missing or stale: render in the background and let the client retry
+    thumbnail_renderer.schedule(db, doc_id, doc["file_path"])
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"status": "pending"})
+
+@api_router.get("/public/documents/{public_url}")
+async def view_public_document(request: Request, public_url: str):
+    link = public_links.get(public_url)
+    if link is None:
+        # Reject guessed links without touching Mongo
+        if not await public_links.might_exist(db, public_url):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        
+        doc = await db.documents.find_one({"public_url": public_url}, {"_id": 0, "file_path": 1, "file_name": 1})
+        if not doc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+        
+        file_path_str = doc["file_path"]
+        if file_path_str.startswith(('http://', 'https://')) or storage.redirects:
+            link = public_links.put(public_url, PublicLink(file_path_str, doc["file_name"]))
+        else:
+            # Local file handling, confined to the upload directory
+            try:
+                file_path = storage.local_path(file_path_str)
+                stat_result = file_path.stat()
+            except StoragePathError:
+                log_security_event("PATH_TRAVERSAL_ATTEMPT", f"Attempted access to: {file_path_str}", get_remote_address(request))
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+            except OSError:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+            link = public_links.put(public_url, PublicLink(str(file_path), doc["file_name"], stat_result))
     
     # Check if it's an external URL
-    if file_path_str.startswith(('http://', 'https://')):
+    if link.is_external:
         # Return a redirect response for external URLs
-        from fastapi.responses import RedirectResponse
-        return RedirectResponse(url=file_path_str)
-    
-    # Local file handling
-    file_path = Path(file_path_str)
-    if not file_path.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    
-    return FileResponse(file_path, media_type="application/pdf", filename=doc["file_name"])
+        return RedirectResponse(url=link.file_path)
+    
+    if storage.redirects:
+        # Signed URLs expire, so the redirect itself must not be cached
+        try:
+            url = storage.presigned_url(link.file_path, link.file_name)
+        except StoragePathError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+        return RedirectResponse(url=url, headers={"Cache-Control": "no-store"})
+    
+    headers = {"Cache-Control": PUBLIC_CACHE_CONTROL, "ETag": link.etag}
+    if request.headers.get("if-none-match") == link.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    offloaded = storage.offload_response(Path(link.file_path), link.file_name, headers=headers)
+    if offloaded:
+        return offloaded
+    
+    return FileResponse(
+        link.file_path, media_type="application/pdf", filename=link.file_name,
+        stat_result=link.stat_result, headers=headers
+    )
+
+# JOB ENDPOINTS
+def parse_job(job: dict) -> Job:
+    for field in ('created_at', 'updated_at', 'started_at', 'finished_at'):
+        if isinstance(job.get(field), str):
+            job[field] = datetime.fromisoformat(job[field])
+    return Job(**job)
+
+@api_router.get("/jobs", response_model=List[Job])
+async def list_jobs(job_status: Optional[JobStatus] = None, current_user: User = Depends(get_admin_user)):
+    query = {"status": job_status.value} if job_status else {}
+    jobs = await db.jobs.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return [parse_job(job) for job in jobs]
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job or (current_user.role != UserRole.ADMIN and job["created_by"] != current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return parse_job(job)
+
+@api_router.post("/admin/gc")
+async def start_file_gc(dry_run: bool = True, current_user: User = Depends(get_admin_user)):
+    """Queue a sweep of UPLOAD_DIR for files no document references; dry_run=false quarantines them"""
+    job = await enqueue_job(db, "collect_orphaned_files", {"dry_run": dry_run}, current_user.id, max_attempts=1)
+    log_admin_action(current_user.id, "START_FILE_GC", job["id"])
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"job_id": job["id"]})
+
+@api_router.post("/admin/membership/check")
+async def start_membership_check(repair: bool = False, current_user: User = Depends(get_admin_user)):
+    """Queue a comparison of teams.user_ids and users.team_ids, repairing drift if asked"""
+    job = await enqueue_job(db, "check_membership", {"repair": repair}, current_user.id, max_attempts=1)
+    log_admin_action(current_user.id, "CHECK_MEMBERSHIP", job["id"])
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"job_id": job["id"]})
+
+@api_router.get("/admin/search-cache", response_model=SearchCacheStats)
+async def get_search_cache_stats(current_user: User = Depends(get_admin_user)):
+    """Search result cache counters of the worker that serves the request"""
+    return search_cache.stats()
+
+@api_router.get(ADMISSION_METRICS_PATH.removeprefix("/api"), response_model=Dict[str, AdmissionClassStats])
+async def get_admission_stats(current_user: User = Depends(get_admin_user)):
+    """Admission control state per route class, for the worker that serves the request"""
+    return admission.stats()
 
 # API TOKEN ENDPOINTS (Admin only)
 @api_router.get("/admin/api-tokens", response_model=List[ApiTokenResponse])
@@ -863,7 +1393,7 @@ async def create_api_token(request: Request, token_data: ApiTokenCreate, current
     now = datetime.now(timezone.utc)
     
     new_token = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "name": name,
         "description": sanitize_string(token_data.description, 500) if token_data.description else None,
         "token_hash": token_hash,
@@ -976,6 +1506,9 @@ allowed_origins = os.environ.get('CORS_ORIGINS', '*')
 if allowed_origins == '*':
     logger.warning("⚠️  WARNING: CORS is set to allow all origins. Configure CORS_ORIGINS for production!")
 
+# Inside CORS, so browsers can read the 503 of a shed request
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -984,3 +1517,6 @@ app.add_middleware(
     allow_headers=["*"],
     max_age=3600,
 )
+
+# Outermost, so every response (including CORS and error responses) is negotiated
+app.add_middleware(CompressionMiddleware)
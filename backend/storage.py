@@ -0,0 +1,289 @@
+"""
+Document file storage.
+
+Documents keep their original local file_path (an upload under one of
+UPLOAD_BASE_PATHS). The storage backend decides where the bytes for that path
+live and how they are served:
+
+    local  files in UPLOAD_DIR, streamed by the API or, with FILE_OFFLOAD,
+           handed to the front proxy (X-Accel-Redirect / X-Sendfile)
+    s3     objects in an S3-compatible bucket (AWS, MinIO, ...), served through
+           short-lived presigned redirects so bytes never pass through Python
+
+Copy existing uploads into the bucket:
+    STORAGE_BACKEND=s3 S3_BUCKET=docs python storage.py --upload
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from starlette.responses import Response
+
+from security import UPLOAD_DIR, UPLOAD_BASE_PATHS
+
+logger = logging.getLogger(__name__)
+
+# Storage Configuration
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local").lower()
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.environ.get("S3_REGION", "us-east-1")
+S3_PRESIGN_SECONDS = int(os.environ.get("S3_PRESIGN_SECONDS", "300"))
+# Removed files are quarantined first (local: this directory, S3: QUARANTINE_KEY_PREFIX
+# under S3_PREFIX) and purged by the orphan sweep once older than UPLOAD_QUARANTINE_DAYS
+UPLOAD_QUARANTINE_DIR = Path(os.environ.get("UPLOAD_QUARANTINE_DIR", str(UPLOAD_DIR.parent / "quarantine")))
+UPLOAD_QUARANTINE_DAYS = float(os.environ.get("UPLOAD_QUARANTINE_DAYS", "30"))
+QUARANTINE_KEY_PREFIX = ".quarantine/"
+
+# Local files can be sent by the front proxy after the API has checked access:
+#   x-accel     nginx; FILE_OFFLOAD_PREFIX is the internal location mapped to UPLOAD_DIR
+#   x-sendfile  Apache mod_xsendfile, lighttpd; FILE_OFFLOAD_PREFIX is UPLOAD_DIR as the proxy sees it
+FILE_OFFLOAD = os.environ.get("FILE_OFFLOAD", "").lower()
+OFFLOAD_HEADERS = {"x-accel": "X-Accel-Redirect", "x-sendfile": "X-Sendfile"}
+FILE_OFFLOAD_PREFIX = os.environ.get(
+    "FILE_OFFLOAD_PREFIX", "/_protected_uploads" if FILE_OFFLOAD == "x-accel" else str(UPLOAD_DIR)
+).rstrip("/")
+
+
+class StoragePathError(ValueError):
+    """file_path does not point inside the upload area"""
+
+
+def upload_key(file_path: str) -> str:
+    """Path of an upload relative to its base path, shared by every backend"""
+    normalized = os.path.normpath(file_path)
+    for base in [str(UPLOAD_DIR), *UPLOAD_BASE_PATHS]:
+        if normalized.startswith(base + os.sep):
+            key = normalized[len(base) + 1:]
+            if key and not key.startswith(".."):
+                return key
+    raise StoragePathError(file_path)
+
+
+def local_upload_path(file_path: str, root: Path = UPLOAD_DIR) -> Path:
+    """file_path resolved (symlinks, ..) and confined to root"""
+    path = Path(file_path).resolve()
+    if not path.is_relative_to(root.resolve()):
+        raise StoragePathError(file_path)
+    return path
+
+
+def content_disposition(file_name: str) -> str:
+    """Same header Starlette's FileResponse sends for a download"""
+    quoted = quote(file_name)
+    if quoted != file_name:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{file_name}"'
+
+
+def quarantine_file(path: Path, root: Path = UPLOAD_DIR, quarantine_dir: Path = UPLOAD_QUARANTINE_DIR) -> bool:
+    """Move a file under root into quarantine_dir, keeping its relative path.
+    A timestamp suffix keeps earlier copies of the same path; moving the file
+    back restores it."""
+    relative = path.relative_to(root)
+    target = quarantine_dir / relative.parent / f"{relative.name}.{time.time_ns()}"
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(target))
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not quarantine {path}: {e}")
+        return False
+    logger.info(f"Quarantined {path} as {target}")
+    return True
+
+
+def purge_quarantine_dir(cutoff: float, dry_run: bool = False, quarantine_dir: Path = UPLOAD_QUARANTINE_DIR) -> int:
+    """Remove (or count) quarantined files moved there before cutoff (Unix time)"""
+    purged = 0
+    for path in quarantine_dir.rglob("*"):
+        if not path.is_file():
+            continue
+        try:
+            quarantined_at = int(path.name.rsplit(".", 1)[1]) / 1e9
+        except (IndexError, ValueError):
+            continue  # Not written by quarantine_file
+        if quarantined_at >= cutoff:
+            continue
+        if dry_run:
+            purged += 1
+            continue
+        try:
+            path.unlink()
+            purged += 1
+        except OSError as e:
+            logger.warning(f"Could not purge {path}: {e}")
+    return purged
+
+
+class LocalStorage:
+    """Uploads on the local disk, served by the API process or the front proxy"""
+
+    name = "local"
+    redirects = False
+
+    def __init__(self, root: Path = UPLOAD_DIR, offload: str = FILE_OFFLOAD, offload_prefix: str = FILE_OFFLOAD_PREFIX):
+        if offload and offload not in OFFLOAD_HEADERS:
+            raise RuntimeError(f"Unknown FILE_OFFLOAD: {offload}")
+        self.root = root.resolve()
+        self.offload = offload
+        self.offload_prefix = offload_prefix
+
+    def local_path(self, file_path: str) -> Path:
+        return local_upload_path(file_path, self.root)
+
+    def offload_response(self, path: Path, file_name: str, media_type: str = "application/pdf",
+                         headers: Optional[dict] = None) -> Optional[Response]:
+        """Empty response telling the proxy which file to send, or None when offload is off.
+        path must come from local_path(). The proxy keeps Content-Type,
+        Content-Disposition and Cache-Control, and answers ranges and
+        conditional requests itself."""
+        if not self.offload:
+            return None
+        relative = path.relative_to(self.root).as_posix()
+        target = f"{self.offload_prefix}/{relative}"
+        if self.offload == "x-accel":
+            target = quote(target)
+        offload_headers = dict(headers or {})
+        offload_headers[OFFLOAD_HEADERS[self.offload]] = target
+        offload_headers["Content-Disposition"] = content_disposition(file_name)
+        return Response(media_type=media_type, headers=offload_headers)
+
+    async def delete(self, file_path: str) -> bool:
+        """Moves the file to UPLOAD_QUARANTINE_DIR"""
+        try:
+            path = self.local_path(file_path)
+        except StoragePathError:
+            return False
+        return quarantine_file(path, self.root)
+
+
+class S3Storage:
+    """Uploads in an S3-compatible bucket under S3_PREFIX + upload_key(file_path)"""
+
+    name = "s3"
+    redirects = True
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 region: str = S3_REGION, presign_seconds: int = S3_PRESIGN_SECONDS):
+        import boto3
+        from botocore.config import Config
+
+        if not bucket:
+            raise RuntimeError("S3_BUCKET must be set when STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.presign_seconds = presign_seconds
+        # Path-style addressing works with MinIO and other self-hosted endpoints
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url, region_name=region,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"})
+        )
+
+    def key(self, file_path: str) -> str:
+        return self.prefix + upload_key(file_path)
+
+    def presigned_url(self, file_path: str, file_name: str, media_type: str = "application/pdf") -> str:
+        """Signing is local computation, no request is made to the bucket"""
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.key(file_path),
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": content_disposition(file_name),
+            },
+            ExpiresIn=self.presign_seconds,
+        )
+
+    async def upload(self, local_path: Path, file_path: str) -> None:
+        await asyncio.to_thread(self.client.upload_file, str(local_path), self.bucket, self.key(file_path))
+
+    async def delete(self, file_path: str) -> bool:
+        """Moves the object under QUARANTINE_KEY_PREFIX, like LocalStorage.delete"""
+        try:
+            key = self.key(file_path)
+        except StoragePathError:
+            return False
+        target = f"{self.prefix}{QUARANTINE_KEY_PREFIX}{upload_key(file_path)}.{time.time_ns()}"
+        try:
+            await asyncio.to_thread(
+                self.client.copy_object, Bucket=self.bucket, Key=target, CopySource={"Bucket": self.bucket, "Key": key}
+            )
+            await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+        except Exception as e:
+            logger.warning(f"Could not quarantine s3://{self.bucket}/{key}: {e}")
+            return False
+        logger.info(f"Quarantined s3://{self.bucket}/{key} as {target}")
+        return True
+
+    async def purge_quarantine(self, cutoff: float, dry_run: bool = False) -> int:
+        """Delete (or count) quarantined objects older than cutoff (Unix time)"""
+        return await asyncio.to_thread(self._purge_quarantine, cutoff, dry_run)
+
+    def _purge_quarantine(self, cutoff: float, dry_run: bool) -> int:
+        purged = 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + QUARANTINE_KEY_PREFIX):
+            expired = [{"Key": obj["Key"]} for obj in page.get("Contents", []) if obj["LastModified"].timestamp() < cutoff]
+            if not expired:
+                continue
+            if dry_run:
+                purged += len(expired)
+                continue
+            # A page holds at most 1000 keys, the delete_objects limit
+            result = self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": expired, "Quiet": True})
+            errors = result.get("Errors", [])
+            for error in errors:
+                logger.warning(f"Could not purge s3://{self.bucket}/{error['Key']}: {error.get('Message')}")
+            purged += len(expired) - len(errors)
+        return purged
+
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return LocalStorage()
+
+
+storage = create_storage()
+
+
+async def upload_existing(target: S3Storage) -> int:
+    """Copy every file under UPLOAD_DIR (thumbnails excluded) into the bucket"""
+    from thumbnails import THUMBNAIL_DIR_NAME
+
+    uploaded = 0
+    for path in UPLOAD_DIR.rglob("*"):
+        if not path.is_file() or THUMBNAIL_DIR_NAME in path.parts:
+            continue
+        await target.upload(path, str(path))
+        uploaded += 1
+        if uploaded % 100 == 0:
+            logger.info("Uploaded %d files", uploaded)
+    return uploaded
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage document storage")
+    parser.add_argument("--upload", action="store_true", help="Copy local uploads into the S3 bucket")
+    args = parser.parse_args()
+    if not args.upload:
+        parser.print_help()
+    elif not isinstance(storage, S3Storage):
+        parser.error("--upload needs STORAGE_BACKEND=s3")
+    else:
+        count = asyncio.run(upload_existing(storage))
+        logger.info("Upload finished: %d files", count)
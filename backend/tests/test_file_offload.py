@@ -0,0 +1,94 @@
+"""
+File Offload Tests (X-Accel-Redirect)
+Tests for:
+- GET /api/documents/{id}/view answered by nginx from the internal uploads location
+- GET /api/public/documents/{public_url} through the same path
+- The internal location is not reachable directly
+
+Needs the API running with FILE_OFFLOAD=x-accel behind the nginx fixture in
+tests/nginx/nginx.conf; OFFLOAD_PROXY_URL points at that nginx.
+"""
+
+import pytest
+import requests
+import os
+import uuid
+from pathlib import Path
+
+PROXY_URL = os.environ.get('OFFLOAD_PROXY_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_USER = "admin"
+ADMIN_PASSWORD = "admin"
+
+# The API's UPLOAD_DIR; the test writes its own file there and never uses tracked uploads
+UPLOAD_DIR = Path(__file__).resolve().parent.parent / "uploads"
+SAMPLE_PDF = b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+
+pytestmark = pytest.mark.skipif(not PROXY_URL, reason="OFFLOAD_PROXY_URL not set")
+
+
+class TestFileOffload:
+    """Test file downloads sent by the front proxy"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get admin token and a document pointing at a temporary PDF"""
+        self.file = UPLOAD_DIR / f"TEST_offload_{uuid.uuid4().hex}.pdf"
+        self.file.write_bytes(SAMPLE_PDF)
+        
+        response = requests.post(f"{PROXY_URL}/api/auth/login", json={
+            "email": ADMIN_USER,
+            "password": ADMIN_PASSWORD
+        })
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        
+        response = requests.post(f"{PROXY_URL}/api/workspaces", headers=self.headers, json={
+            "name": "TEST_OffloadWorkspace"
+        })
+        assert response.status_code == 200, f"Failed to create workspace: {response.text}"
+        self.workspace_id = response.json()["id"]
+        
+        response = requests.post(
+            f"{PROXY_URL}/api/workspaces/{self.workspace_id}/documents",
+            headers=self.headers,
+            json={"file_name": "TEST_offload.pdf", "file_path": str(self.file)}
+        )
+        assert response.status_code == 200, f"Failed to create document: {response.text}"
+        self.document = response.json()
+        yield
+        requests.delete(f"{PROXY_URL}/api/workspaces/{self.workspace_id}", headers=self.headers)
+        self.file.unlink(missing_ok=True)
+    
+    def test_01_view_document_served_by_proxy(self):
+        """Test GET /api/documents/{id}/view - bytes come from nginx, not the API"""
+        response = requests.get(f"{PROXY_URL}/api/documents/{self.document['id']}/view", headers=self.headers)
+        assert response.status_code == 200, f"Failed to view document: {response.text}"
+        assert "X-Accel-Redirect" not in response.headers
+        assert response.headers["Content-Type"].startswith("application/pdf")
+        assert 'filename="TEST_offload.pdf"' in response.headers["Content-Disposition"]
+        assert int(response.headers["Content-Length"]) == len(SAMPLE_PDF)
+        assert response.content == SAMPLE_PDF
+        print(f"✓ Proxy sent {len(response.content)} bytes")
+    
+    def test_02_view_document_requires_auth(self):
+        """Test GET /api/documents/{id}/view - no token, no file"""
+        response = requests.get(f"{PROXY_URL}/api/documents/{self.document['id']}/view")
+        assert response.status_code in [401, 403], f"Expected 401/403, got {response.status_code}"
+        print("✓ Unauthenticated view rejected")
+    
+    def test_03_public_document_served_by_proxy(self):
+        """Test GET /api/public/documents/{public_url} - offloaded with cache headers kept"""
+        response = requests.get(f"{PROXY_URL}/api/public/documents/{self.document['public_url']}")
+        assert response.status_code == 200, f"Failed to view public document: {response.text}"
+        assert "X-Accel-Redirect" not in response.headers
+        assert "public" in response.headers.get("Cache-Control", "")
+        assert response.content == SAMPLE_PDF
+        print("✓ Public document sent by proxy")
+    
+    def test_04_internal_location_not_public(self):
+        """Test the internal uploads location can't be requested directly"""
+        response = requests.get(f"{PROXY_URL}/_protected_uploads/{self.file.name}")
+        assert response.status_code == 404, f"Expected 404, got {response.status_code}"
+        print("✓ Internal location hidden")
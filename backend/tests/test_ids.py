@@ -0,0 +1,61 @@
+"""
+Record Id Tests
+Tests for:
+- new_id() returns UUIDv7 ids that increase within a process
+- An explicit (backdated) timestamp round-trips through id_time()
+- Seeded generators are reproducible
+"""
+
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from ids import IdGenerator, id_time  # noqa: E402
+
+
+class TestIds:
+    """Test UUIDv7 generation"""
+
+    def test_01_ids_increase(self):
+        """Test new ids - version 7, strictly increasing without a timestamp"""
+        generate = IdGenerator()
+        ids = [generate() for _ in range(5000)]
+        assert all(uuid.UUID(i).version == 7 for i in ids)
+        assert ids == sorted(ids) and len(set(ids)) == len(ids)
+        print("✓ Ids increase")
+
+    def test_02_backdated_timestamp_round_trips(self):
+        """Test IdGenerator(at) - a past at is kept even after current-time ids"""
+        generate = IdGenerator()
+        generate()
+        at = datetime(2024, 3, 5, 10, 30, 15, 123456, tzinfo=timezone.utc)
+        record_id = generate(at)
+        assert id_time(record_id) == at.replace(microsecond=123000)
+        print("✓ Backdated id decodes to its timestamp")
+
+    def test_03_backdated_ids_sort_by_time(self):
+        """Test IdGenerator(at) - ids follow their timestamps, also within one millisecond"""
+        generate = IdGenerator()
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        stamps = [start + timedelta(microseconds=250 * i) for i in range(2000)]
+        ids = [generate(at) for at in stamps]
+        assert ids == sorted(ids)
+        assert [id_time(i) for i in ids] == [at.replace(microsecond=at.microsecond // 1000 * 1000) for at in stamps]
+        print("✓ Backdated ids sort by time")
+
+    def test_04_seeded_generator_reproducible(self):
+        """Test IdGenerator(rng) - same seed and timestamps, same ids"""
+        at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        first = IdGenerator(random.Random(7))
+        second = IdGenerator(random.Random(7))
+        assert [first(at) for _ in range(10)] == [second(at) for _ in range(10)]
+        print("✓ Seeded ids reproducible")
+
+    def test_05_other_ids_have_no_time(self):
+        """Test id_time() - uuid4 and non-uuid ids"""
+        assert id_time(str(uuid.uuid4())) is None
+        assert id_time("not-an-id") is None
+        print("✓ uuid4 ids carry no time")
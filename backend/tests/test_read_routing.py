@@ -0,0 +1,88 @@
+"""
+Read Routing Tests (replica set secondaries)
+Tests for:
+- GET /api/workspaces/{id}/documents - a document is listed right after it is created
+- GET /api/documents/search - an update is searchable right after it is made
+- POST /api/documents/batch - a deleted document is reported missing right after the delete
+
+Needs the API running with READ_PREFERENCE=secondaryPreferred against the
+three-member replica set in tests/replica_set/docker-compose.yml;
+REPLICA_SET_API_URL points at that API.
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+API_URL = os.environ.get('REPLICA_SET_API_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_USER = "admin"
+ADMIN_PASSWORD = "admin"
+
+ROUNDS = 20
+
+pytestmark = pytest.mark.skipif(not API_URL, reason="REPLICA_SET_API_URL not set")
+
+
+class TestReadYourWrites:
+    """Test that reads routed to secondaries see the caller's own writes"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - get admin token and a scratch workspace"""
+        response = requests.post(f"{API_URL}/api/auth/login", json={
+            "email": ADMIN_USER,
+            "password": ADMIN_PASSWORD
+        })
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = requests.post(f"{API_URL}/api/workspaces", headers=self.headers, json={
+            "name": f"TEST_read_routing_{uuid.uuid4().hex[:8]}"
+        })
+        assert response.status_code == 200, f"Workspace creation failed: {response.text}"
+        self.workspace_id = response.json()["id"]
+        yield
+        requests.delete(f"{API_URL}/api/workspaces/{self.workspace_id}", headers=self.headers)
+
+    def create_document(self, file_name):
+        response = requests.post(f"{API_URL}/api/workspaces/{self.workspace_id}/documents", headers=self.headers, json={
+            "file_name": file_name,
+            "file_path": "https://hcostadealmeria.net/read-routing-test.pdf"
+        })
+        assert response.status_code == 200, f"Document creation failed: {response.text}"
+        return response.json()["id"]
+
+    def test_01_list_after_create(self):
+        """Test GET /api/workspaces/{id}/documents - every new document is listed immediately"""
+        for i in range(ROUNDS):
+            doc_id = self.create_document(f"Informe {i}.pdf")
+            response = requests.get(f"{API_URL}/api/workspaces/{self.workspace_id}/documents", headers=self.headers)
+            assert response.status_code == 200
+            assert doc_id in [doc["id"] for doc in response.json()], f"Round {i}: new document not listed"
+        print(f"✓ {ROUNDS} documents listed right after creation")
+
+    def test_02_search_after_update(self):
+        """Test GET /api/documents/search - a renamed document is found by its new name immediately"""
+        doc_id = self.create_document("Borrador.pdf")
+        for i in range(ROUNDS):
+            name = f"Renombrado{uuid.uuid4().hex[:8]}"
+            response = requests.put(f"{API_URL}/api/documents/{doc_id}", headers=self.headers, json={"file_name": f"{name}.pdf"})
+            assert response.status_code == 200, f"Update failed: {response.text}"
+            response = requests.get(f"{API_URL}/api/documents/search", headers=self.headers, params={"q": name})
+            assert response.status_code == 200
+            assert [doc["id"] for doc in response.json()] == [doc_id], f"Round {i}: renamed document not found"
+        print(f"✓ {ROUNDS} renames searchable right after the update")
+
+    def test_03_batch_after_delete(self):
+        """Test POST /api/documents/batch - a deleted document is missing immediately"""
+        for i in range(ROUNDS):
+            doc_id = self.create_document(f"Temporal {i}.pdf")
+            response = requests.delete(f"{API_URL}/api/documents/{doc_id}", headers=self.headers)
+            assert response.status_code == 200, f"Delete failed: {response.text}"
+            response = requests.post(f"{API_URL}/api/documents/batch", headers=self.headers, json={"ids": [doc_id]})
+            assert response.status_code == 200
+            assert response.json()["missing"] == [doc_id], f"Round {i}: deleted document still returned"
+        print(f"✓ {ROUNDS} deletes visible right after the delete")
@@ -0,0 +1,63 @@
+"""
+Refresh Token Tests
+Tests for:
+- POST /api/auth/login - returns a refresh token
+- POST /api/auth/refresh - rotates the refresh token and issues a new access token
+- POST /api/auth/refresh - rejects unknown tokens
+- POST /api/auth/logout - revokes the session
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_USER = "admin"
+ADMIN_PASSWORD = "admin"
+
+
+class TestRefreshTokens:
+    """Test session renewal with rotating refresh tokens"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup - log in and keep the refresh token"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": ADMIN_USER,
+            "password": ADMIN_PASSWORD
+        })
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        self.refresh_token = response.json()["refresh_token"]
+        assert self.refresh_token, "Login did not return a refresh token"
+        yield
+
+    def test_01_refresh_rotates_token(self):
+        """Test POST /api/auth/refresh - new access token and a different refresh token"""
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": self.refresh_token})
+        assert response.status_code == 200, f"Refresh failed: {response.text}"
+
+        data = response.json()
+        assert data["token_type"] == "bearer"
+        assert data["user"]["email"] == ADMIN_USER
+        assert data["refresh_token"] != self.refresh_token
+
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers={"Authorization": f"Bearer {data['access_token']}"})
+        assert me.status_code == 200, f"New access token rejected: {me.text}"
+        print("✓ Refresh issued a working access token and rotated the refresh token")
+
+    def test_02_unknown_token_rejected(self):
+        """Test POST /api/auth/refresh - unknown token returns 401"""
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": "not-a-token"})
+        assert response.status_code == 401, f"Expected 401, got {response.status_code}"
+        print("✓ Unknown refresh token rejected")
+
+    def test_03_logout_revokes_session(self):
+        """Test POST /api/auth/logout - the refresh token stops working"""
+        response = requests.post(f"{BASE_URL}/api/auth/logout", json={"refresh_token": self.refresh_token})
+        assert response.status_code == 200, f"Logout failed: {response.text}"
+
+        response = requests.post(f"{BASE_URL}/api/auth/refresh", json={"refresh_token": self.refresh_token})
+        assert response.status_code == 401, f"Expected 401 after logout, got {response.status_code}"
+        print("✓ Logout revoked the refresh token")
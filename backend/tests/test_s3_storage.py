@@ -0,0 +1,104 @@
+"""
+S3 Storage Tests
+Tests for:
+- Uploads land under S3_PREFIX + the path relative to the upload base path
+- presigned_url() returns a working, signed GET with the download headers
+- Paths outside the upload area are refused (no key, no URL, no delete)
+- Deleted objects are quarantined and purged after the retention
+
+Runs the S3 backend against moto's in-process S3 (no bucket or network needed).
+"""
+
+import asyncio
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from storage import QUARANTINE_KEY_PREFIX, S3Storage, StoragePathError  # noqa: E402
+
+BUCKET = "test-documents"
+PREFIX = "tenant-a"
+UPLOAD_BASE = "/app/backend/uploads"
+
+
+class TestS3Storage:
+    """Test the S3 backend against a mocked bucket"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch, tmp_path):
+        """Setup - fake credentials, an empty bucket and a local file to upload"""
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        with moto.mock_aws():
+            boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+            self.storage = S3Storage(bucket=BUCKET, prefix=PREFIX, endpoint_url=None, region="us-east-1", presign_seconds=60)
+            self.local_file = tmp_path / "informe.pdf"
+            self.local_file.write_bytes(b"%PDF-1.4 test")
+            yield
+
+    def test_01_upload_key_under_prefix(self):
+        """Test upload() - object key is the prefix plus the path below the upload base"""
+        file_path = f"{UPLOAD_BASE}/2026/informe.pdf"
+        asyncio.run(self.storage.upload(self.local_file, file_path))
+        keys = [obj["Key"] for obj in self.storage.client.list_objects_v2(Bucket=BUCKET)["Contents"]]
+        assert keys == [f"{PREFIX}/2026/informe.pdf"]
+        print("✓ Upload stored under the prefix")
+
+    def test_02_presigned_url_downloads_object(self):
+        """Test presigned_url() - signed, expiring GET that serves the object as a download"""
+        file_path = f"{UPLOAD_BASE}/informe.pdf"
+        asyncio.run(self.storage.upload(self.local_file, file_path))
+        url = self.storage.presigned_url(file_path, "Informe alta.pdf")
+
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        assert parsed.path == f"/{BUCKET}/{PREFIX}/informe.pdf"  # Path-style addressing
+        assert query["X-Amz-Expires"] == ["60"]
+        assert "X-Amz-Signature" in query
+        assert query["response-content-type"] == ["application/pdf"]
+        assert query["response-content-disposition"] == ["attachment; filename*=utf-8''Informe%20alta.pdf"]
+
+        response = requests.get(url)
+        assert response.status_code == 200, f"Presigned GET failed: {response.status_code}"
+        assert response.content == b"%PDF-1.4 test"
+        print("✓ Presigned URL serves the object")
+
+    def test_03_paths_outside_upload_area_refused(self):
+        """Test key()/presigned_url()/delete() - traversal and foreign paths are refused"""
+        for file_path in [f"{UPLOAD_BASE}/../server.py", "/etc/passwd", UPLOAD_BASE, f"{UPLOAD_BASE}-other/a.pdf"]:
+            with pytest.raises(StoragePathError):
+                self.storage.key(file_path)
+            with pytest.raises(StoragePathError):
+                self.storage.presigned_url(file_path, "a.pdf")
+            assert asyncio.run(self.storage.delete(file_path)) is False
+        print("✓ Paths outside the upload area refused")
+
+    def test_04_delete_quarantines_object(self):
+        """Test delete() - object moves under the quarantine prefix"""
+        file_path = "/uploads/informe.pdf"
+        asyncio.run(self.storage.upload(self.local_file, file_path))
+        assert asyncio.run(self.storage.delete(file_path)) is True
+        keys = [obj["Key"] for obj in self.storage.client.list_objects_v2(Bucket=BUCKET)["Contents"]]
+        assert len(keys) == 1 and keys[0].startswith(f"{PREFIX}/{QUARANTINE_KEY_PREFIX}informe.pdf.")
+        print("✓ Deleted object quarantined")
+
+    def test_05_purge_quarantine_by_age(self):
+        """Test purge_quarantine() - only objects quarantined before the cutoff are deleted"""
+        file_path = "/uploads/informe.pdf"
+        asyncio.run(self.storage.upload(self.local_file, file_path))
+        asyncio.run(self.storage.delete(file_path))
+        assert asyncio.run(self.storage.purge_quarantine(time.time() - 3600)) == 0
+        assert asyncio.run(self.storage.purge_quarantine(time.time() + 60, dry_run=True)) == 1
+        assert self.storage.client.list_objects_v2(Bucket=BUCKET)["KeyCount"] == 1
+        assert asyncio.run(self.storage.purge_quarantine(time.time() + 60)) == 1
+        assert self.storage.client.list_objects_v2(Bucket=BUCKET)["KeyCount"] == 0
+        print("✓ Quarantine purged after retention")
@@ -0,0 +1,33 @@
+import re
+import unicodedata
+
+
+def _build_fold_table() -> dict:
+    """Map accented Latin letters to their base letter, one char to one char"""
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if len(base) == 1 and base != char:
+            table[code] = base
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents without changing string length, so offsets
+    found in the folded text can be applied to the original"""
+    stripped = text.translate(FOLD_TABLE)
+    folded = stripped.lower()
+    if len(folded) == len(text):
+        return folded
+    # Rare characters whose lowercase form is longer are kept as-is
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in stripped)
+
+
+def tokenize(text: str, min_length: int = 1) -> list:
+    """Split text into folded word tokens"""
+    return [t for t in TOKEN_PATTERN.findall(fold_text(text).lower()) if len(t) >= min_length]
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from storage import local_upload_path
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # PDF previews are skipped without pypdfium2
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail Configuration
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "256"))  # Longest side in pixels
+THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "webp").lower()  # webp or png
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_MAX_PENDING = int(os.environ.get("THUMBNAIL_MAX_PENDING", "200"))
+THUMBNAIL_DIR_NAME = ".thumbnails"
+THUMBNAIL_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg'}
+THUMBNAIL_MEDIA_TYPES = {"webp": "image/webp", "png": "image/png"}
+THUMBNAIL_CACHE_CONTROL = "private, max-age=86400"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def thumbnail_path(source: Path, key: str) -> Path:
+    """Thumbnails live in a hidden directory next to the upload they preview"""
+    return source.parent / THUMBNAIL_DIR_NAME / key
+
+
+def _render_pdf(source: Path, size: int):
+    pdf = pdfium.PdfDocument(str(source))
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        image = page.render(scale=size / max(width, height)).to_pil()
+        page.close()
+        return image
+    finally:
+        pdf.close()
+
+
+def _render_image(source: Path, size: int):
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image.draft("RGB", (size, size))  # Lets JPEG decode at reduced scale
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        return image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+
+def render_thumbnail(source_path: str, size: int = THUMBNAIL_SIZE, fmt: str = THUMBNAIL_FORMAT) -> str:
+    """Render a thumbnail for a local file and return its content-hash key.
+
+    Runs inside the process pool. Identical content maps to the same key, so
+    a file that was already rendered is not rendered again. Sources outside
+    UPLOAD_DIR raise StoragePathError.
+    """
+    source = local_upload_path(source_path)
+    key = f"{file_sha256(source)}-{size}.{fmt}"
+    target = thumbnail_path(source, key)
+    if target.exists():
+        return key
+
+    if source.suffix.lower() == ".pdf":
+        if pdfium is None:
+            raise RuntimeError("pypdfium2 is not installed")
+        image = _render_pdf(source, size)
+    else:
+        image = _render_image(source, size)
+
+    target.parent.mkdir(exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    image.save(tmp, format=fmt.upper())
+    os.replace(tmp, target)
+    return key
+
+
+class ThumbnailRenderer:
+    """Schedules thumbnail renders on a process pool and records the result key"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = {}
+
+    @staticmethod
+    def can_render(file_path: str) -> bool:
+        if file_path.startswith(('http://', 'https://')):
+            return False
+        suffix = Path(file_path).suffix.lower()
+        if suffix == ".pdf" and pdfium is None:
+            return False
+        return suffix in THUMBNAIL_EXTENSIONS
+
+    def schedule(self, db, doc_id: str, file_path: str) -> bool:
+        """Queue a render; returns False when the file can't be previewed or the queue is full"""
+        if not self.can_render(file_path):
+            return False
+        if doc_id in self._pending:
+            return True
+        if len(self._pending) >= THUMBNAIL_MAX_PENDING:
+            # Backpressure: the thumbnail endpoint reschedules on the next request
+            return False
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        self._pending[doc_id] = asyncio.create_task(self._render(db, doc_id, file_path))
+        return True
+
+    async def _render(self, db, doc_id: str, file_path: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            key = await loop.run_in_executor(self._executor, render_thumbnail, file_path)
+            # Only record the key if the document still points at the rendered file
+            await db.documents.update_one(
+                {"id": doc_id, "file_path": file_path},
+                {"$set": {"thumbnail_key": key}}
+            )
+        except Exception as e:
+            logger.warning(f"Thumbnail render failed for document {doc_id}: {e}")
+            # Remember the failure so unreadable files are not re-rendered on every request
+            await db.documents.update_one(
+                {"id": doc_id, "file_path": file_path},
+                {"$set": {"thumbnail_failed": file_path}}
+            )
+        finally:
+            self._pending.pop(doc_id, None)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+thumbnail_renderer = ThumbnailRenderer()
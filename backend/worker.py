@@ -0,0 +1,86 @@
+"""
+Background job worker.
+
+Claims jobs from the jobs collection and runs them outside the API process.
+Several workers (processes or hosts) can run at once; claims are atomic and
+leases let another worker resume a job whose worker died.
+
+Usage:
+    python worker.py                      # one process, one job at a time
+    python worker.py --processes 4 --concurrency 2
+    python worker.py --types delete_workspace
+
+Set JOB_INLINE_WORKER=false on the API when dedicated workers are running.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from jobs import JobWorker, ensure_job_indexes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger("worker")
+
+
+async def run_worker(concurrency: int, job_types) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    await ensure_job_indexes(db)
+
+    worker = JobWorker(db, concurrency=concurrency, job_types=job_types)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Running jobs are cancelled and requeued for other workers
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(worker.stop()))
+
+    await worker.run()
+    client.close()
+
+
+def worker_process(concurrency: int, job_types) -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run_worker(concurrency, job_types))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs in flight per process")
+    parser.add_argument("--types", nargs="*", help="Only run these job types")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        worker_process(args.concurrency, args.types)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=worker_process, args=(args.concurrency, args.types), daemon=False)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_sigterm(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    # Children receive Ctrl-C through the process group; SIGTERM is forwarded
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, forward_sigterm)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
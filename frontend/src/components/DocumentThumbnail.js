@@ -0,0 +1,44 @@
+import { useState, useEffect } from 'react';
+import { FileText } from 'lucide-react';
+import api from '../utils/api';
+
+const PREVIEWABLE = /\.(pdf|png|jpe?g)$/i;
+
+export default function DocumentThumbnail({ doc }) {
+  const [src, setSrc] = useState(null);
+
+  useEffect(() => {
+    const isExternal = doc.file_path.startsWith('http://') || doc.file_path.startsWith('https://');
+    if (isExternal || !PREVIEWABLE.test(doc.file_path)) return;
+
+    let objectUrl = null;
+    let cancelled = false;
+
+    // 202 means the thumbnail is still rendering; keep the icon until the next load
+    api.getDocumentThumbnail(doc.id)
+      .then((response) => {
+        if (cancelled || response.status !== 200) return;
+        objectUrl = URL.createObjectURL(response.data);
+        setSrc(objectUrl);
+      })
+      .catch(() => {});
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [doc.id, doc.file_path]);
+
+  if (!src) {
+    return <FileText className="h-4 w-4 text-slate-400" />;
+  }
+
+  return (
+    <img
+      src={src}
+      alt=""
+      className="h-10 w-8 object-cover rounded border border-slate-200"
+      data-testid={`document-thumbnail-${doc.id}`}
+    />
+  );
+}
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
@@ -7,11 +7,13 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '.
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription } from '../components/ui/dialog';
 import { Label } from '../components/ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
-import { Search, Edit, Trash2, ExternalLink, FileText, Plus, Link2, Copy, AlertCircle, ChevronLeft, ChevronRight } from 'lucide-react';
+import { Search, Edit, Trash2, ExternalLink, Plus, Link2, Copy, AlertCircle, ChevronLeft, ChevronRight } from 'lucide-react';
 import { toast } from 'sonner';
 import api from '../utils/api';
 import { formatDateSpanish } from '../utils/dateFormat';
 import { copyToClipboard } from '../utils/clipboard';
+import { subscribeDocumentEvents } from '../utils/documentEvents';
+import DocumentThumbnail from './DocumentThumbnail';
 
 export default function WorkspaceView() {
   const { workspaceId } = useParams();
@@ -38,11 +40,25 @@ export default function WorkspaceView() {
   const [pageSize, setPageSize] = useState(50);
   const [paginatedDocuments, setPaginatedDocuments] = useState([]);
   const [totalPages, setTotalPages] = useState(0);
+  const syncToken = useRef(null);
+  const syncTimer = useRef(null);
 
   useEffect(() => {
-    loadWorkspace();
+    syncToken.current = null;
+    loadBootstrap();
     loadDocuments();
-    loadMetadata();
+  }, [workspaceId]);
+
+  useEffect(() => {
+    // Changes pushed by the server, batched into one sync
+    const unsubscribe = subscribeDocumentEvents(workspaceId, () => {
+      clearTimeout(syncTimer.current);
+      syncTimer.current = setTimeout(syncDocuments, 300);
+    });
+    return () => {
+      unsubscribe();
+      clearTimeout(syncTimer.current);
+    };
   }, [workspaceId]);
 
   useEffect(() => {
@@ -79,21 +95,54 @@ export default function WorkspaceView() {
     }
   };
 
-  const loadWorkspace = async () => {
+  // Workspace, its metadata and the first page in one request, shown while the full list loads
+  const loadBootstrap = async () => {
     try {
-      const response = await api.getWorkspaces();
-      const ws = response.data.find(w => w.id === workspaceId);
-      setWorkspace(ws);
+      const response = await api.getWorkspaceBootstrap(workspaceId);
+      const metaMap = {};
+      response.data.metadata.forEach(meta => {
+        metaMap[meta.id] = meta;
+      });
+      setWorkspace(response.data.workspace);
+      setMetadataDefinitions(metaMap);
+      if (!syncToken.current) {
+        setDocuments(response.data.documents);
+        setLoading(false);
+      }
     } catch (error) {
       toast.error('Error al cargar el espacio');
     }
   };
 
+  // Follow the changes feed from `since` until no pages remain
+  const fetchChanges = async (since) => {
+    const changed = new Map();
+    const deleted = new Set();
+    let token = since;
+    let hasMore = true;
+    while (hasMore) {
+      const response = await api.getDocumentChanges(workspaceId, token);
+      response.data.documents.forEach(doc => {
+        changed.set(doc.id, doc);
+        deleted.delete(doc.id);
+      });
+      response.data.deleted.forEach(id => {
+        changed.delete(id);
+        deleted.add(id);
+      });
+      token = response.data.token;
+      hasMore = response.data.has_more;
+    }
+    return { changed, deleted, token };
+  };
+
+  const sortByCreated = (docs) => docs.sort((a, b) => (a.created_at < b.created_at ? 1 : -1));
+
   const loadDocuments = async () => {
     try {
-      const response = await api.getDocuments(workspaceId);
-      setDocuments(response.data);
-      setFilteredDocuments(response.data);
+      const { changed, token } = await fetchChanges(null);
+      syncToken.current = token;
+      setDocuments(sortByCreated([...changed.values()]));
     } catch (error) {
       toast.error('Error al cargar documentos');
     } finally {
@@ -101,16 +150,24 @@ export default function WorkspaceView() {
     }
   };
 
-  const loadMetadata = async () => {
+  // Apply only what changed since the last load
+  const syncDocuments = async () => {
+    if (!syncToken.current) {
+      return loadDocuments();
+    }
     try {
-      const response = await api.getMetadata();
-      const metaMap = {};
-      response.data.forEach(meta => {
-        metaMap[meta.id] = meta;
-      });
-      setMetadataDefinitions(metaMap);
+      const { changed, deleted, token } = await fetchChanges(syncToken.current);
+      syncToken.current = token;
+      setDocuments(prev => sortByCreated([
+        ...prev.filter(doc => !changed.has(doc.id) && !deleted.has(doc.id)),
+        ...changed.values()
+      ]));
     } catch (error) {
-      console.error('Error loading metadata');
+      if (error.response?.status === 410) {
+        loadDocuments();
+      } else {
+        toast.error('Error al cargar documentos');
+      }
     }
   };
 
@@ -120,7 +177,7 @@ export default function WorkspaceView() {
     try {
       await api.deleteDocument(docId);
       toast.success('Documento eliminado');
-      loadDocuments();
+      syncDocuments();
     } catch (error) {
       toast.error('Error al eliminar documento');
     }
@@ -146,7 +203,7 @@ export default function WorkspaceView() {
       toast.success('Documento actualizado');
       setEditingDoc(null);
       setEditMetadataError('');
-      loadDocuments();
+      syncDocuments();
     } catch (error) {
       if (error instanceof SyntaxError) {
         setEditMetadataError('JSON inválido. Por favor, corrija el formato.');
@@ -179,7 +236,7 @@ export default function WorkspaceView() {
       setNewDocData({ file_name: '', file_path: '', metadata: {} });
       setNewDocMetadataText('{}');
       setMetadataError('');
-      loadDocuments();
+      syncDocuments();
     } catch (error) {
       if (error instanceof SyntaxError) {
         setMetadataError('JSON inválido. Por favor, corrija el formato.');
@@ -304,7 +361,7 @@ export default function WorkspaceView() {
                     <TableRow key={doc.id} data-testid={`document-row-${doc.id}`}>
                       <TableCell className="font-medium">
                         <div className="flex items-center gap-2">
-                          <FileText className="h-4 w-4 text-slate-400" />
+                          <DocumentThumbnail doc={doc} />
                           {doc.file_name}
                         </div>
                       </TableCell>
@@ -1,4 +1,4 @@
-import { createContext, useContext, useState, useEffect } from 'react';
+import { createContext, useContext, useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const AuthContext = createContext(null);
@@ -9,6 +9,52 @@ export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
+  const refreshPromise = useRef(null);
+
+  const storeSession = (accessToken, refreshToken) => {
+    setToken(accessToken);
+    localStorage.setItem('token', accessToken);
+    if (refreshToken) {
+      localStorage.setItem('refreshToken', refreshToken);
+    }
+    axios.defaults.headers.common['Authorization'] = `Bearer ${accessToken}`;
+  };
+
+  // One renewal at a time; concurrent 401s wait for the same refresh
+  const refreshSession = () => {
+    if (!refreshPromise.current) {
+      const refreshToken = localStorage.getItem('refreshToken');
+      refreshPromise.current = (refreshToken
+        ? axios.post(`${API_URL}/auth/refresh`, { refresh_token: refreshToken })
+        : Promise.reject(new Error('No refresh token'))
+      ).then((response) => {
+        storeSession(response.data.access_token, response.data.refresh_token);
+        return response.data.access_token;
+      }).finally(() => {
+        refreshPromise.current = null;
+      });
+    }
+    return refreshPromise.current;
+  };
+
+  useEffect(() => {
+    const interceptor = axios.interceptors.response.use(undefined, async (error) => {
+      const original = error.config;
+      if (error.response?.status !== 401 || !original || original._retried || original.url?.includes('/auth/')) {
+        return Promise.reject(error);
+      }
+      original._retried = true;
+      try {
+        const accessToken = await refreshSession();
+        original.headers['Authorization'] = `Bearer ${accessToken}`;
+        return axios(original);
+      } catch (refreshError) {
+        logout();
+        return Promise.reject(error);
+      }
+    });
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
 
   useEffect(() => {
     if (token) {
@@ -33,27 +79,32 @@ export const AuthProvider = ({ children }) => {
 
   const login = async (email, password) => {
     const response = await axios.post(`${API_URL}/auth/login`, { email, password });
-    const { access_token, user: userData } = response.data;
-    setToken(access_token);
+    const { access_token, refresh_token, user: userData } = response.data;
+    storeSession(access_token, refresh_token);
     setUser(userData);
-    localStorage.setItem('token', access_token);
-    axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
     return userData;
   };
 
   const changePassword = async (oldPassword, newPassword) => {
-    await axios.post(`${API_URL}/auth/change-password`, {
+    const response = await axios.post(`${API_URL}/auth/change-password`, {
       old_password: oldPassword,
       new_password: newPassword
     });
+    // Other sessions were signed out; keep this one with its new refresh token
+    localStorage.setItem('refreshToken', response.data.refresh_token);
     // Refresh user data
     await fetchCurrentUser();
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      axios.post(`${API_URL}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
     setToken(null);
     setUser(null);
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     delete axios.defaults.headers.common['Authorization'];
   };
 
@@ -23,17 +23,21 @@ export const api = {
 
   // Workspaces
   getWorkspaces: () => axios.get(`${API_URL}/workspaces`),
+  getWorkspace: (id) => axios.get(`${API_URL}/workspaces/${id}`),
+  getWorkspaceBootstrap: (id) => axios.get(`${API_URL}/workspaces/${id}/bootstrap`),
   createWorkspace: (data) => axios.post(`${API_URL}/workspaces`, data),
   updateWorkspace: (id, data) => axios.put(`${API_URL}/workspaces/${id}`, data),
   deleteWorkspace: (id) => axios.delete(`${API_URL}/workspaces/${id}`),
 
   // Documents
   getDocuments: (workspaceId) => axios.get(`${API_URL}/workspaces/${workspaceId}/documents`),
+  getDocumentChanges: (workspaceId, since) => axios.get(`${API_URL}/workspaces/${workspaceId}/documents/changes`, { params: since ? { since } : {} }),
   createDocument: (workspaceId, data) => axios.post(`${API_URL}/workspaces/${workspaceId}/documents`, data),
   updateDocument: (id, data) => axios.put(`${API_URL}/documents/${id}`, data),
   deleteDocument: (id) => axios.delete(`${API_URL}/documents/${id}`),
   searchDocuments: (query) => axios.get(`${API_URL}/documents/search?q=${encodeURIComponent(query)}`),
   getDocumentUrl: (docId) => `${API_URL}/documents/${docId}/view`,
+  getDocumentThumbnail: (docId) => axios.get(`${API_URL}/documents/${docId}/thumbnail`, { responseType: 'blob' }),
   getPublicDocumentUrl: (publicUrl) => `${API_URL}/public/documents/${publicUrl}`
 };
 
@@ -0,0 +1,76 @@
+import axios from 'axios';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+
+// Parse one server-sent event block into { id, event, data }
+const parseEvent = (block) => {
+  const message = { id: null, event: 'message', data: '', retry: null };
+  block.split('\n').forEach(line => {
+    if (!line || line.startsWith(':')) return;
+    const separator = line.indexOf(':');
+    const field = separator === -1 ? line : line.slice(0, separator);
+    const value = separator === -1 ? '' : line.slice(separator + 1).replace(/^ /, '');
+    if (field === 'id') message.id = value;
+    else if (field === 'event') message.event = value;
+    else if (field === 'data') message.data += value;
+    else if (field === 'retry') message.retry = parseInt(value, 10);
+  });
+  return message;
+};
+
+// EventSource can't send the Authorization header, so the stream is read with fetch.
+// Reconnects with Last-Event-ID until the returned function is called. A 401 backs off and
+// retries with whatever token axios holds by then (the refresh may still be in flight).
+export const subscribeDocumentEvents = (workspaceId, onEvent) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retryMs = 2000;
+  let unauthorizedMs = 0;
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { Accept: 'text/event-stream' };
+        const authorization = axios.defaults.headers.common['Authorization'];
+        if (authorization) headers.Authorization = authorization;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+        const response = await fetch(`${API_URL}/workspaces/${workspaceId}/documents/events`, {
+          headers,
+          signal: controller.signal
+        });
+        if ([403, 404].includes(response.status)) return;
+        if (response.status === 401) {
+          unauthorizedMs = Math.min(unauthorizedMs ? unauthorizedMs * 2 : retryMs, 60000);
+          await new Promise(resolve => setTimeout(resolve, unauthorizedMs));
+          continue;
+        }
+
+        if (response.ok) {
+          unauthorizedMs = 0;
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+              const message = parseEvent(buffer.slice(0, end));
+              buffer = buffer.slice(end + 2);
+              if (message.retry) retryMs = message.retry;
+              if (message.id) lastEventId = message.id;
+              if (message.data) onEvent(message.event, JSON.parse(message.data));
+            }
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise(resolve => setTimeout(resolve, retryMs));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};